@@ -0,0 +1,112 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from pipeline import CANVAS_FORMATS, OUTPUT_FORMATS, COLOR_MODES, IMAGE_POOL_BUDGET_MB, ScrapeError, RunTimer, generate_cards, card_filename, get_render_pool
+
+# ==============================================================================
+# 헤드리스 배치 모드: URL 목록 -> 기사별 카드뉴스 ZIP + 해시태그
+#   python batch.py urls.txt -o out --format 9:16
+#   cat urls.txt | python batch.py - -o out
+# ==============================================================================
+
+def read_urls(source):
+    f = sys.stdin if source == "-" else open(source, encoding="utf-8")
+    try:
+        urls = [line.strip() for line in f]
+    finally:
+        if f is not sys.stdin: f.close()
+    return [u for u in urls if u and not u.startswith("#")]
+
+def output_stem(index, url):
+    last = urlsplit(url).path.rstrip("/").rsplit("/", 1)[-1]
+    slug = re.sub(r"[^0-9A-Za-z_-]+", "", last)[:40] or hashlib.sha1(url.encode("utf-8")).hexdigest()[:10]
+    return f"{index+1:03d}_{slug}"
+
+def run_job(index, url, options, out_dir, retries):
+    stem = output_stem(index, url)
+    record = {"url": url, "status": "failed", "attempts": 0, "seconds": 0.0, "error": None, "zip": None, "hashtags": None}
+    start = time.time()
+    for attempt in range(retries + 1):
+        record["attempts"] = attempt + 1
+        timer = RunTimer(url=url, format=options["format"], source="batch", attempt=attempt + 1)
+        error = None
+        zip_path = os.path.join(out_dir, stem + ".zip")
+        part_path = zip_path + ".part"
+        try:
+            # 카드는 인코딩되는 대로 ZIP 파일에 바로 기록 (기사당 메모리에 카드 묶음을 쌓지 않음)
+            ext = OUTPUT_FORMATS[options["output_format"]][0]
+            with zipfile.ZipFile(part_path, "w") as zf:
+                result = generate_cards(url, options, timer=timer, on_card=lambda i, data, preview: zf.writestr(card_filename(i, ext), data))
+            os.replace(part_path, zip_path)
+            tag_path = os.path.join(out_dir, stem + ".txt")
+            with open(tag_path, "w", encoding="utf-8") as f: f.write(result["hashtags"] + "\n")
+            record.update(status="ok", error=None, zip=zip_path, hashtags=result["hashtags"], title=result["title"])
+            break
+        except ScrapeError as e:
+            # 본문 추출 실패는 재시도해도 같은 결과
+            record["error"] = str(e)
+            error = e
+            break
+        except Exception as e:
+            record["error"] = f"{type(e).__name__}: {e}"
+            error = e
+            if attempt < retries: time.sleep(2 ** attempt)
+        finally:
+            if os.path.exists(part_path): os.remove(part_path)
+            record["stages"] = timer.finish(error)["stages"]
+    record["seconds"] = round(time.time() - start, 2)
+    print(f"[{record['status']:>6}] {stem} ({record['seconds']}s, {record['attempts']}회) {record['error'] or ''}", file=sys.stderr)
+    return record
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="기사 URL 목록으로 카드뉴스 ZIP을 일괄 생성합니다.")
+    parser.add_argument("source", help="URL 목록 파일 (한 줄에 하나, '-'는 stdin)")
+    parser.add_argument("-o", "--out-dir", default="batch_output")
+    parser.add_argument("--format", choices=sorted(CANVAS_FORMATS), default="1:1")
+    parser.add_argument("--api-key", default=os.environ.get("GOOGLE_API_KEY"))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--retries", type=int, default=2)
+    parser.add_argument("--ai-color", action="store_true", help="이미지 대신 AI 추천 테마 색상 사용")
+    parser.add_argument("--color-mode", choices=list(COLOR_MODES), default="average", help="이미지 테마 색상 추출 방식")
+    parser.add_argument("--fast-blur", action="store_true")
+    parser.add_argument("--no-plan-cache", action="store_true", help="같은 기사 내용이어도 AI 기획을 새로 요청")
+    parser.add_argument("--image-budget-mb", type=int, default=IMAGE_POOL_BUDGET_MB, help="기사당 이미지 메모리 상한 (MB, 디코딩한 풀 + 원본 바이트)")
+    parser.add_argument("--output-format", choices=list(OUTPUT_FORMATS), default="PNG")
+    parser.add_argument("--png-level", type=int, choices=range(10), default=6, metavar="0-9", help="PNG 압축 레벨")
+    parser.add_argument("--quality", type=int, default=90, help="JPEG/WEBP 품질")
+    args = parser.parse_args(argv)
+
+    if not args.api_key: parser.error("API Key 필요 (--api-key 또는 GOOGLE_API_KEY)")
+    urls = read_urls(args.source)
+    if not urls: parser.error("URL 없음")
+    os.makedirs(args.out_dir, exist_ok=True)
+
+    options = {
+        "api_key": args.api_key, "format": args.format, "auto_color": not args.ai_color, "color_mode": args.color_mode,
+        "streaming": False, "fast_blur": args.fast_blur, "image_budget_mb": args.image_budget_mb,
+        "output_format": args.output_format, "png_compress_level": args.png_level, "quality": args.quality,
+        "plan_cache": not args.no_plan_cache, "keep_cards": False,
+    }
+    # 렌더 워커는 작업 스레드를 띄우기 전에 fork
+    get_render_pool()
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=max(1, args.workers)) as executor:
+        records = list(executor.map(lambda job: run_job(job[0], job[1], options, args.out_dir, args.retries), enumerate(urls)))
+
+    ok = sum(r["status"] == "ok" for r in records)
+    summary = {"total": len(records), "ok": ok, "failed": len(records) - ok, "seconds": round(time.time() - start, 2), "jobs": records}
+    with open(os.path.join(args.out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print(f"완료: {ok}/{len(records)} 성공, {summary['seconds']}s -> {args.out_dir}", file=sys.stderr)
+    return 0 if ok == len(records) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
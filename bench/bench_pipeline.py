@@ -0,0 +1,266 @@
+import argparse
+import http.server
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+sys.path.insert(0, ROOT)
+
+import pipeline
+import renderer
+
+# ==============================================================================
+# 오프라인 벤치마크: 로컬 HTTP 서버(기사/이미지) + 고정 응답 가짜 Gemini
+# 실제 경로(pipeline.generate_cards: 스크랩 캐시/TaskGraph/렌더 프로세스 풀/스트리밍 인코딩)를 RunTimer 구간별로 측정
+#   python bench/bench_pipeline.py --runs 5 -o bench_results.json
+#   python bench/bench_pipeline.py --compare bench_results.json
+#   python bench/bench_pipeline.py --micro   # 단계별 직렬 마이크로 측정 추가
+# ==============================================================================
+
+# (파일명, 너비, 높이): 300px 미만 사진과 로고/배너는 풀에서 걸러지는지 함께 측정
+FIXTURE_IMAGES = [
+    ("photo_0.jpg", 2000, 1333), ("photo_1.jpg", 1600, 1067), ("photo_2.jpg", 240, 160),
+    ("photo_3.jpg", 3000, 2000), ("photo_4.jpg", 1200, 1200), ("photo_5.jpg", 1800, 1200),
+    ("photo_6.jpg", 1024, 768), ("photo_7.jpg", 2400, 1600),
+    ("logo.png", 320, 80), ("banner_ad.jpg", 970, 250),
+]
+
+def make_fixture_image(name, w, h, seed):
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:h, 0:w]
+    base = np.stack([(xx * 255 // max(1, w - 1)), (yy * 255 // max(1, h - 1)), ((xx + yy) * 127 // max(1, w + h))], axis=-1)
+    noise = rng.integers(-40, 40, size=(h // 8 + 1, w // 8 + 1, 3)).repeat(8, axis=0).repeat(8, axis=1)[:h, :w]
+    img = Image.fromarray(np.clip(base + noise, 0, 255).astype(np.uint8), "RGB")
+    buf = io.BytesIO()
+    img.save(buf, format="PNG" if name.endswith(".png") else "JPEG", quality=90)
+    return buf.getvalue()
+
+class FixtureHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.files.get(self.path.split("?")[0])
+        if body is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8" if self.path.endswith(".html") else "image/jpeg")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args): pass
+
+def start_fixture_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), FixtureHandler)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    with open(os.path.join(FIXTURES, "article.html"), encoding="utf-8") as f:
+        html = f.read().replace("$BASE", base)
+    server.files = {"/news/article.html": html.encode("utf-8")}
+    for i, (name, w, h) in enumerate(FIXTURE_IMAGES):
+        server.files[f"/img/{name}"] = make_fixture_image(name, w, h, seed=i)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, base + "/news/article.html"
+
+# --- 가짜 Gemini: 고정 기획안을 청크 단위로 돌려줌 ---
+class FakeChunk:
+    def __init__(self, text): self.text = text
+
+class FakeResponse:
+    def __init__(self, text, chunk_size=64):
+        self.text = text
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for i in range(0, len(self.text), self.chunk_size): yield FakeChunk(self.text[i:i + self.chunk_size])
+
+class FakeModel:
+    def __init__(self, plan): self.plan = plan
+    def generate_content(self, prompt, stream=False): return FakeResponse(self.plan)
+
+# 폰트는 --font-file/--fonts-dir 것을 사용 (서버 시작 시 자산 준비 대신)
+class ReadyAssets:
+    def __init__(self, font_paths):
+        self.done = threading.Event()
+        self.done.set()
+        self.report = {"fonts": font_paths, "entries": [], "ready": True}
+
+    def wait(self, timeout=None): return self.report
+
+def clear_render_caches():
+    renderer.load_font.cache_clear()
+    renderer.get_font_set.cache_clear()
+    renderer.text_advance.cache_clear()
+    renderer.word_gap.cache_clear()
+    renderer.fitted_font_size.cache_clear()
+    for fn in (renderer.load_local_image, renderer.get_logo_layers, renderer.get_qr_layer, renderer.get_outro_template): fn.cache_clear()
+    renderer.create_smooth_gradient.cache_clear()
+    with renderer._background_lock: renderer._background_cache.clear()
+
+def clear_pipeline_caches(cache_root):
+    clear_render_caches()
+    with pipeline._color_lock: pipeline._color_cache.clear()
+    with pipeline._pool_lock: pipeline._pool_cache.clear()
+    # 스크랩/기획안 디스크 캐시는 실행마다 빈 디렉터리로
+    run_dir = tempfile.mkdtemp(dir=cache_root)
+    scrape_cache = pipeline.ScrapeCache(os.path.join(run_dir, "scrape"), pipeline.SCRAPE_CACHE_TTL, pipeline.SCRAPE_CACHE_MAX_ENTRIES)
+    plan_cache = pipeline.PlanCache(os.path.join(run_dir, "plans"), pipeline.PLAN_CACHE_TTL, pipeline.PLAN_CACHE_MAX_ENTRIES)
+    pipeline.get_scrape_cache = lambda: scrape_cache
+    pipeline.get_plan_cache = lambda: plan_cache
+    # 렌더 워커의 캐시도 비우기 위해 풀을 새로 생성 (측정 구간 밖)
+    pool = pipeline.get_render_pool()
+    pipeline.get_render_pool.clear()
+    if pool is not None: pool.shutdown()
+    pipeline.get_render_pool()
+
+# generate_cards 1회 -> (구간별 초, 슬라이드별 렌더 초, 정보)
+def bench_once(url, canvas_format, font_paths, warm, cache_root, output_format="PNG", color_mode="average"):
+    if not warm: clear_pipeline_caches(cache_root)
+    # 앱과 같은 방식: 카드를 도착하는 대로 메모리 ZIP에 기록
+    options = {"api_key": "bench", "format": canvas_format, "output_format": output_format, "color_mode": color_mode, "zip": True, "keep_cards": False}
+    timer = pipeline.RunTimer(source="bench", format=canvas_format, warm=warm)
+    result = pipeline.generate_cards(url, options, timer=timer)
+    zip_bytes = result["zip"]
+    record = timer.finish(path=None)
+    stages = {name: ms / 1000 for name, ms in record["stages"].items()}
+    stages["total"] = record["total_ms"] / 1000
+    types = [slide.get("TYPE", "BOX").upper() for slide in result["slides"]]
+    slide_times = sorted(({"index": sp["index"], "type": types[sp["index"]], "seconds": sp["ms"] / 1000} for sp in record["spans"] if sp["name"] == "render.slide"), key=lambda t: t["index"])
+    return stages, slide_times, {"pool_images": len(result["sources"]), "slides": len(result["slides"]), "zip_bytes": len(zip_bytes)}
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+# --micro: 각 단계를 직렬로 직접 호출 (풀/동시 실행 없이 단계 자체 비용만)
+def micro_once(url, canvas_format, model, font_paths, warm, output_format="PNG", color_mode="average"):
+    if not warm: clear_render_caches()
+    canvas_w, canvas_h, is_story = pipeline.CANVAS_FORMATS[canvas_format]
+    t = {}
+
+    (tag, title, text, images), t["scrape"] = timed(pipeline.advanced_scrape, url)
+
+    def plan():
+        parser = pipeline.SlidePlanParser()
+        chunks = pipeline.iter_response_text(model.generate_content(pipeline.build_prompt(title, text), stream=True), {"skipped": 0, "finish": None})
+        return parser, list(pipeline.iter_slide_plan(chunks, parser))
+    (parser, slides), t["plan"] = timed(plan)
+
+    img_pool, t["images"] = timed(pipeline.fetch_image_pool, images, limit=5, min_width=300, size=(canvas_w, canvas_h))
+    pool_keys = [f"bench-{i}" for i in range(len(img_pool))] if warm else [None] * len(img_pool)
+    color, t["dominant_color"] = timed(pipeline.get_dominant_color, img_pool[0], pool_keys[0], color_mode)
+
+    assets = {
+        "font_paths": font_paths,
+        "logo_paths": (os.path.join(ROOT, pipeline.LOGO_SYMBOL_PATH), os.path.join(ROOT, pipeline.LOGO_TEXT_PATH)),
+    }
+    rendered, slide_times = [], []
+    for i, slide in enumerate(slides):
+        spec = {"slide": slide, "index": i, "total": pipeline.SLIDE_COUNT, "color": color, "tag": tag, "link": url}
+        is_outro = slide.get("TYPE", "BOX").upper() == "OUTRO"
+        slide_assets = dict(assets, background=None if is_outro else img_pool[i % len(img_pool)],
+                            background_key=None if is_outro else pool_keys[i % len(img_pool)])
+        img, dt = timed(renderer.render_slide, spec, slide_assets, (canvas_w, canvas_h, is_story))
+        rendered.append(img)
+        slide_times.append({"index": i, "type": slide.get("TYPE", "BOX").upper(), "seconds": dt})
+    t["render"] = sum(s["seconds"] for s in slide_times)
+
+    def encode():
+        pool = pipeline.get_encode_pool()
+        return list(pool.map(lambda img: pipeline.encode_card(img, output_format), rendered))
+    cards, t["encode"] = timed(encode)
+    zip_bytes, t["zip"] = timed(pipeline.build_zip, cards, pipeline.OUTPUT_FORMATS[output_format][0])
+    t["total"] = sum(t.values())
+    return t, slide_times, {"pool_images": len(img_pool), "slides": len(slides), "zip_bytes": len(zip_bytes)}
+
+def summarize(samples):
+    return {"median": statistics.median(samples), "mean": statistics.fmean(samples), "min": min(samples), "max": max(samples), "runs": samples}
+
+def git_revision():
+    try: return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except Exception: return None
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f: baseline = json.load(f)
+    print(f"\n비교 기준: {baseline_path} ({baseline['meta'].get('git')})")
+    for fmt, stages in current["results"].items():
+        for stage, stat in stages["stages"].items():
+            old = baseline["results"].get(fmt, {}).get("stages", {}).get(stage)
+            if not old: continue
+            delta = (stat["median"] - old["median"]) / old["median"] * 100 if old["median"] else 0.0
+            print(f"  [{fmt}] {stage:<15} {old['median']*1000:9.1f}ms -> {stat['median']*1000:9.1f}ms ({delta:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="One-Click News 오프라인 단계별 벤치마크")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--formats", nargs="+", choices=sorted(pipeline.CANVAS_FORMATS), default=["1:1", "9:16"])
+    parser.add_argument("--fonts-dir", default=os.path.join(ROOT, "fonts"), help="title.ttf/body.ttf/serif.ttf 위치")
+    parser.add_argument("--font-file", help="세 서체 대신 하나의 TTF로 측정")
+    parser.add_argument("--warm", action="store_true", help="실행 간 렌더 캐시 유지 (기본: 매 실행 초기화)")
+    parser.add_argument("--output-format", choices=list(pipeline.OUTPUT_FORMATS), default="PNG")
+    parser.add_argument("--color-mode", choices=list(pipeline.COLOR_MODES), default="average")
+    parser.add_argument("-o", "--out", default="bench_results.json")
+    parser.add_argument("--compare", help="이전 결과 JSON과 중앙값 비교")
+    parser.add_argument("--micro", action="store_true", help="단계별 직렬 마이크로 측정도 함께 기록")
+    args = parser.parse_args(argv)
+
+    if args.font_file: font_paths = {k: args.font_file for k in ("title", "body", "serif")}
+    else: font_paths = {k: os.path.join(args.fonts_dir, f"{k}.ttf") for k in ("title", "body", "serif")}
+    missing = [p for p in font_paths.values() if not os.path.exists(p)]
+    if missing: parser.error(f"폰트 없음: {missing} (앱을 한 번 실행하거나 --font-file 지정)")
+
+    out_path, font_paths = os.path.abspath(args.out), {k: os.path.abspath(p) for k, p in font_paths.items()}
+    if args.compare: args.compare = os.path.abspath(args.compare)
+    # 로고 등 상대 경로 자산 기준, 렌더 워커는 서버 스레드보다 먼저 fork
+    os.chdir(ROOT)
+    pipeline.get_asset_warmup = lambda: ReadyAssets(font_paths)
+    pipeline.get_single_flight = lambda: pipeline.SingleFlight(ttl=0)
+    pipeline.get_render_pool()
+    server, url = start_fixture_server()
+    with open(os.path.join(FIXTURES, "plan.txt"), encoding="utf-8") as f: model = FakeModel(f.read())
+    pipeline.get_model = lambda api_key, refresh=False: ("fake", model)
+
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as cache_root:
+            clear_pipeline_caches(cache_root)
+            for fmt in args.formats:
+                bench_once(url, fmt, font_paths, args.warm, cache_root, args.output_format, args.color_mode)  # 워밍업 (임포트/커넥션)
+                runs = [bench_once(url, fmt, font_paths, args.warm, cache_root, args.output_format, args.color_mode) for _ in range(args.runs)]
+                names = list(dict.fromkeys(k for r in runs for k in r[0]))
+                stages = {k: summarize([r[0].get(k, 0.0) for r in runs]) for k in names}
+                per_slide = [summarize([r[1][i]["seconds"] for r in runs]) | {"type": runs[0][1][i]["type"]} for i in range(len(runs[0][1]))]
+                results[fmt] = {"stages": stages, "slides": per_slide, "info": runs[0][2]}
+                print(f"[{fmt}] " + "  ".join(f"{k}={v['median']*1000:.1f}ms" for k, v in stages.items()))
+                if args.micro:
+                    micro = [micro_once(url, fmt, model, font_paths, args.warm, args.output_format, args.color_mode) for _ in range(args.runs)]
+                    results[fmt]["micro"] = {k: summarize([r[0][k] for r in micro]) for k in micro[0][0]}
+                    print(f"[{fmt} micro] " + "  ".join(f"{k}={v['median']*1000:.1f}ms" for k, v in results[fmt]["micro"].items()))
+    finally:
+        server.shutdown()
+
+    report = {
+        "meta": {
+            "git": git_revision(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "runs": args.runs, "warm": args.warm, "output_format": args.output_format, "color_mode": args.color_mode,
+            "python": platform.python_version(), "platform": platform.platform(), "cpu_count": os.cpu_count(), "render_processes": pipeline.RENDER_PROCESSES,
+        },
+        "results": results,
+    }
+    with open(out_path, "w", encoding="utf-8") as f: json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {out_path}")
+    if args.compare: compare(report, args.compare)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
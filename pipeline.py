@@ -0,0 +1,1314 @@
+import streamlit as st
+import google.generativeai as genai
+import google.ai.generativelanguage as glm
+from newspaper import Article, Config
+import requests
+from requests.compat import chardet
+from bs4 import BeautifulSoup
+from PIL import Image, ImageFile, ImageFont
+import lxml.html
+import numpy as np
+import io
+import zipfile
+import os
+import re
+import threading
+import time
+import json
+import hashlib
+import unicodedata
+from contextlib import contextmanager
+from collections import OrderedDict
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode, urljoin
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Future
+from concurrent.futures.process import BrokenProcessPool
+from renderer import render_slide_timed, init_render_worker, warm_render_assets, get_background
+
+# ==============================================================================
+# [1] 설정 및 고정 자산
+# ==============================================================================
+LOGO_SYMBOL_PATH = "segye_symbol.png"
+LOGO_TEXT_PATH = "segye_text.png"
+FONT_DIR = "fonts"
+# [FIX] 한자 지원 완벽한 Noto Sans KR로 교체
+# google/fonts 저장소의 기준 리비전: 폰트 고정값(ASSET_PINS)은 이 리비전의 파일 기준이므로 함께 바꿀 것
+GOOGLE_FONTS_REF = "main"
+FONT_SOURCES = {
+    'title': f"https://github.com/google/fonts/raw/{GOOGLE_FONTS_REF}/ofl/notosanskr/NotoSansKR-Black.ttf",
+    'body': f"https://github.com/google/fonts/raw/{GOOGLE_FONTS_REF}/ofl/notosanskr/NotoSansKR-Bold.ttf",
+    'serif': f"https://github.com/google/fonts/raw/{GOOGLE_FONTS_REF}/ofl/notoserifkr/NotoSerifKR-Bold.ttf",
+}
+# 고정 자산의 기대 (크기, sha256): 시작할 때마다 실제 파일과 대조, 다르면 다시 받음(폰트)/준비 실패(로고)
+# None: 고정값 없음 -> 열리는지만 검사하고 상태표에 pinned=False로 표시
+ASSET_PINS = {
+    'font:title': None,
+    'font:body': None,
+    'font:serif': None,
+    'logo:segye_symbol.png': (86364, "be0007ecf65c7afccb70a41de6a930e217f5efca7192dfe10acc32fb9f5e1e55"),
+    'logo:segye_text.png': (15590, "f5cf0b392d8fbfd12118d1b901a5a611d547aa823c3d8384a8a6917638737370"),
+}
+# 미고정 자산의 (경로, 크기, sha256) 기록: 크기/수정 시각이 같으면 재검증 생략
+ASSET_MANIFEST_PATH = os.path.join(".cache", "assets.json")
+IMG_FETCH_WORKERS = 6
+IMAGE_MIN_WIDTH = 300
+# 크기 확인용으로 먼저 받는 앞부분 (JPEG/PNG/WEBP 헤더는 대부분 수 KB 안에 있음)
+IMAGE_PROBE_BYTES = 32 * 1024
+IMAGE_SKIP_WORDS = ('icon', 'logo', 'banner')
+SCRAPE_CACHE_DIR = os.path.join(".cache", "scrape")
+SCRAPE_CACHE_TTL = 30 * 60
+SCRAPE_CACHE_MAX_ENTRIES = 300
+PLAN_CACHE_DIR = os.path.join(".cache", "plans")
+PLAN_CACHE_TTL = 7 * 24 * 60 * 60
+PLAN_CACHE_MAX_ENTRIES = 500
+# 프롬프트 문구/형식을 바꾸면 올림 (기존 기획안 캐시 무효화)
+PROMPT_VERSION = 1
+# 프롬프트에 넣는 기사 본문 상한 (추정 토큰): 한글은 글자당 1토큰이라 기존 text[:4000]과 같은 분량.
+# 절약은 본문을 자르는 대신 메뉴/저작권/중복 줄을 빼는 데서 얻음
+PROMPT_TEXT_TOKENS = 4000
+# 기사 HTML 최대 읽기 크기 (압축 해제 기준): 초과분은 버리고 연결 종료
+MAX_HTML_BYTES = 3 * 1024 * 1024
+RENDER_PROCESSES = min(4, os.cpu_count() or 1)
+ENCODE_WORKERS = min(4, os.cpu_count() or 1)
+# 렌더 제출~인코딩 완료 사이에 동시에 존재하는 캔버스 수 상한: 렌더 워커 수 + 인코딩 대기 1장 (모든 워커가 쉬지 않도록)
+# 워커 수와 상관없이 최대 MAX_CARDS_IN_FLIGHT_CAP장 (캔버스 메모리 최대치 = 이 수 x 1장)
+MAX_CARDS_IN_FLIGHT_CAP = 6
+MAX_CARDS_IN_FLIGHT = min(max(RENDER_PROCESSES, 1) + 1, MAX_CARDS_IN_FLIGHT_CAP)
+PREVIEW_SIZE = 540
+MODEL_CACHE_TTL = 6 * 60 * 60
+COLOR_THUMB_SIZE = 64
+# 실행 1회가 붙잡는 이미지 메모리 상한: 캔버스 크기 RGB 풀 이미지 + 보관하는 원본 바이트
+# (1080x1920 한 장 약 6MB -> 9:16은 3장, 1:1(약 3.5MB)은 5장까지). 실행 단위 상한이며,
+# 세션에 남는 결과(원본/ZIP/미리보기)와 프로세스 캐시(풀/배경 LRU, single-flight 결과)는 각자의 항목 수 상한으로 제한됨
+IMAGE_POOL_BUDGET_MB = int(os.environ.get("ONECLICK_IMAGE_BUDGET_MB", 24))
+# 슬라이드 수정/포맷 전환 재렌더용으로 디코딩해 둔 풀 (원본 묶음 x 캔버스 크기)
+POOL_CACHE_MAX_ENTRIES = 4
+COLOR_CACHE_MAX_ENTRIES = 256
+# 테마 색상 추출: 평균색(기존 1색 팔레트와 동일) / 채도 가중 k-means 대표색
+COLOR_MODES = {"average": "평균 색상", "vibrant": "선명한 대표 색상"}
+DEFAULT_MODEL = "models/gemini-pro"
+SLIDE_COUNT = 8
+# 같은 기사/옵션의 동시 요청은 먼저 시작한 실행 결과를 공유, 완료 결과는 잠시 재사용
+SINGLE_FLIGHT_TTL = 60
+TIMING_LOG_PATH = os.environ.get("ONECLICK_TIMING_LOG", os.path.join(".cache", "timings.jsonl"))
+CANVAS_FORMATS = {"1:1": (1080, 1080, False), "9:16": (1080, 1920, True)}
+# 출력 형식: (확장자, MIME)
+OUTPUT_FORMATS = {"PNG": ("png", "image/png"), "JPEG": ("jpg", "image/jpeg"), "WEBP": ("webp", "image/webp")}
+DEFAULT_OPTIONS = {
+    "api_key": None,
+    "format": "1:1",
+    "user_image": None,
+    "auto_color": True,
+    "color_mode": "average",
+    "streaming": True,
+    "fast_blur": False,
+    "output_format": "PNG",
+    "png_compress_level": 6,
+    "quality": 90,
+    "image_budget_mb": IMAGE_POOL_BUDGET_MB,
+    "plan_cache": True,
+    # True: 캐시된 기획안을 쓰지 않고 새로 요청 (새 기획안은 캐시에 덮어씀)
+    "plan_refresh": False,
+    # False: 카드 바이트 목록을 결과에 남기지 않음 (on_card나 zip으로 바로 기록하는 경우)
+    "keep_cards": True,
+    # True: 카드를 인코딩되는 대로 메모리 ZIP에 기록해 결과의 "zip"으로 반환
+    "zip": False,
+}
+
+# 카드 결과를 바꾸는 옵션: 슬라이드와 이 값들이 같으면 다시 렌더할 카드가 없음
+RENDER_OPTION_KEYS = ("format", "auto_color", "color_mode", "fast_blur", "output_format", "png_compress_level", "quality")
+
+class ScrapeError(Exception): pass
+class PlanError(Exception): pass
+
+# ==============================================================================
+# [2] 단계별 타이밍 (실행 1회 = JSON 1줄)
+# ==============================================================================
+class RunTimer:
+    def __init__(self, **meta):
+        self.meta = meta
+        self.spans = []
+        self.start = time.perf_counter()
+        self.started_at = time.time()
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds, at=None, **attrs):
+        at = time.perf_counter() - seconds if at is None else at
+        with self.lock:
+            self.spans.append({"name": name, "ms": round(seconds * 1000, 1), "at_ms": round((at - self.start) * 1000, 1), **attrs})
+
+    # with timer.span("단계") as attrs: attrs["bytes"] = ... 로 속성 추가
+    @contextmanager
+    def span(self, name, **attrs):
+        t0 = time.perf_counter()
+        try: yield attrs
+        finally: self.record(name, time.perf_counter() - t0, at=t0, **attrs)
+
+    def totals(self):
+        totals = {}
+        with self.lock:
+            for sp in self.spans: totals[sp["name"]] = round(totals.get(sp["name"], 0) + sp["ms"], 1)
+        return totals
+
+    def finish(self, error=None, path=TIMING_LOG_PATH):
+        record = {
+            "ts": round(self.started_at, 3), **self.meta,
+            "status": "ok" if error is None else type(error).__name__, "error": None if error is None else str(error),
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 1), "stages": self.totals(), "spans": self.spans,
+        }
+        if path:
+            try:
+                os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+                with _timing_log_lock, open(path, "a", encoding="utf-8") as f: f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except: pass
+        return record
+
+_timing_log_lock = threading.Lock()
+
+# 생성기를 소비하는 동안 next()에서 기다린 시간만 합산
+def timed_iter(iterable, timer, name):
+    waited, count = 0.0, 0
+    it = iter(iterable)
+    while True:
+        t0 = time.perf_counter()
+        try: item = next(it)
+        except StopIteration: break
+        finally: waited += time.perf_counter() - t0
+        count += 1
+        yield item
+    timer.record(name, waited, items=count)
+
+# 실행 1회용 작은 DAG: 선행 작업이 끝나면 그 결과를 인자로 받아 실행 (작업마다 스레드 1개, 대기해도 교착 없음)
+#   graph.add("color", fn, deps=["images"]) -> fn(images 결과)
+class TaskGraph:
+    def __init__(self, max_tasks=8):
+        self.executor = ThreadPoolExecutor(max_workers=max_tasks, thread_name_prefix="dag")
+        self.futures = {}
+
+    def add(self, name, fn, deps=()):
+        parents = [self.futures[d] for d in deps]
+        self.futures[name] = self.executor.submit(lambda: fn(*[p.result() for p in parents]))
+
+    def result(self, name):
+        return self.futures[name].result()
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+# ==============================================================================
+# [3] 스크랩 / 자산 / AI 기획
+# ==============================================================================
+
+def extract_tag_from_title(title):
+    match = re.search(r'\[(.*?)\]', title)
+    if match:
+        tag = match.group(1)
+        clean_title = title.replace(f"[{tag}]", "").strip()
+        return tag, clean_title
+    return None, title
+
+# 프로세스 공용 keep-alive 세션 (세션/재실행 간 커넥션 재사용)
+@st.cache_resource
+def get_http_session():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=IMG_FETCH_WORKERS * 2)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def advanced_scrape(url, html=None, timer=None):
+    timer = timer or RunTimer()
+    title, text, top_image = "", "", ""
+    raw_images = []
+    # 한 번 받은 HTML을 newspaper와 폴백 추출기가 함께 사용
+    prefetched = html is not None
+    if html is None: _, html = fetch_html(url, timer=timer)
+    with timer.span("scrape.newspaper", prefetched=prefetched) as sp:
+        try:
+            config = Config()
+            config.browser_user_agent = 'Mozilla/5.0'
+            config.request_timeout = 10
+            article = Article(url, config=config)
+            article.set_html(html or "")
+            sp["bytes"] = len(article.html or "")
+            article.parse()
+            title = article.title
+            text = article.text
+            top_image = article.top_image
+            raw_images = list(article.images)
+        except: pass
+    
+    if len(text) < 50 and html:
+        with timer.span("scrape.fallback", prefetched=prefetched) as sp:
+            try:
+                sp["bytes"] = len(html)
+                soup = BeautifulSoup(html, 'lxml')
+                if not title: title = soup.find('title').text.strip()
+                # 메뉴/머리말/꼬리말 등 본문 밖 영역은 제외, 블록 경계는 줄바꿈으로 유지
+                for tag in soup(['script', 'style', 'noscript', 'nav', 'header', 'footer', 'aside', 'form']): tag.decompose()
+                text = soup.get_text(separator='\n', strip=True)[:5000]
+            except: pass
+    
+    with timer.span("scrape.images") as sp:
+        valid_images = rank_image_candidates(html or "", url, top_image, raw_images)
+        sp["candidates"] = len(valid_images)
+
+    tag, clean_title = extract_tag_from_title(title)
+    return tag, clean_title, text, valid_images
+
+def _int_attr(value):
+    match = re.match(r'\s*(\d+)', str(value or ''))
+    return int(match.group(1)) if match else None
+
+# srcset -> (주소, 너비 또는 None): 너비(w) 표기는 target 이상 중 가장 작은 것(없으면 가장 큰 것), 배율(x) 표기는 가장 큰 배율
+def pick_srcset(srcset, target):
+    variants = []
+    for part in re.split(r'(?<=[wx]),\s*|,\s+', srcset.strip()):
+        bits = part.split()
+        if not bits: continue
+        desc = bits[1].lower() if len(bits) > 1 else '1x'
+        try: value = float(desc[:-1])
+        except ValueError: continue
+        variants.append((desc[-1], value, bits[0]))
+    widths = sorted((v, link) for kind, v, link in variants if kind == 'w')
+    if widths:
+        value, link = next(((v, link) for v, link in widths if v >= target), widths[-1])
+        return link, int(value), [link for _, link in widths]
+    densities = sorted((v, link) for kind, v, link in variants if kind == 'x')
+    return (densities[-1][1], None, [link for _, link in densities]) if densities else (None, None, [])
+
+# 이미지 후보 순위: og:image(대표 이미지) -> 본문 순서, 선언된 크기(srcset 너비, width/height 속성, og:image:width)가
+# 작거나 배너 비율이면 뒤로, srcset 너비가 min_width 미만이면 제외. extra(newspaper 추출분)는 본문에 없던 것만 뒤에 추가
+def rank_image_candidates(html, base_url, top_image="", extra=(), min_width=IMAGE_MIN_WIDTH, target=None):
+    target = target or max(w for w, _, _ in CANVAS_FORMATS.values())
+    candidates, seen = [], set()
+    def add(src, width=None, height=None, intrinsic=False, aliases=()):
+        link = urljoin(base_url, src.strip()) if src else ""
+        if not link.startswith('http') or link in seen: return
+        seen.update(urljoin(base_url, a) for a in aliases)
+        seen.add(link)
+        path = urlsplit(link).path.lower()
+        if any(word in link for word in IMAGE_SKIP_WORDS) or path.endswith(('.svg', '.gif')): return
+        if intrinsic and width and width < min_width: return
+        small = bool(width and width < min_width)
+        banner = bool(width and height and (width >= 3 * height or height >= 3 * width))
+        candidates.append((small or banner, len(candidates), link))
+
+    try: doc = lxml.html.fromstring(html) if html.strip() else None
+    except: doc = None
+    metas = {}
+    if doc is not None:
+        for meta in doc.iter('meta'):
+            key = (meta.get('property') or meta.get('name') or '').lower()
+            if key and key not in metas: metas[key] = meta.get('content')
+    og_width, og_height = _int_attr(metas.get('og:image:width')), _int_attr(metas.get('og:image:height'))
+    add(top_image, og_width, og_height)
+    for key in ('og:image', 'og:image:secure_url', 'og:image:url', 'twitter:image'): add(metas.get(key), og_width, og_height)
+    if doc is not None:
+        for img in doc.iter('img'):
+            width, height = _int_attr(img.get('width')), _int_attr(img.get('height'))
+            src = img.get('data-src') or img.get('data-original') or img.get('src')
+            srcset = img.get('data-srcset') or img.get('srcset')
+            link, variant_width, variants = pick_srcset(srcset, target) if srcset else (None, None, [])
+            if link:
+                # 선택한 변형의 높이는 width/height 속성 비율로 환산
+                if variant_width and width and height: height = variant_width * height // width
+                add(link, variant_width, height, intrinsic=variant_width is not None, aliases=variants + [src or link])
+            else: add(src, width, height)
+    for link in extra: add(link)
+    return [link for _, _, link in sorted(candidates)]
+
+# --- 스크랩 디스크 캐시 (정규화 URL 키, TTL + LRU, ETag/Last-Modified 재검증) ---
+TRACKING_PARAMS = ('utm_', 'fbclid', 'gclid')
+
+def normalize_url(url):
+    parts = urlsplit(url.strip())
+    query = sorted((k, v) for k, v in parse_qsl(parts.query) if not k.startswith(TRACKING_PARAMS))
+    path = parts.path.rstrip('/') or '/'
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ''))
+
+# 인코딩: 응답 헤더 -> 문서 앞부분의 meta charset -> 내용 추정 순
+def _decode_html(resp, data):
+    encoding = resp.encoding
+    if encoding is None or encoding.upper() == 'ISO-8859-1':
+        match = re.search(rb'<meta[^>]+charset=["\']?([\w-]+)', data[:64 * 1024], re.I)
+        encoding = match.group(1).decode('ascii') if match else chardet.detect(data)['encoding']
+    try: return data.decode(encoding or 'utf-8', errors='replace')
+    except LookupError: return data.decode('utf-8', errors='replace')
+
+# 기사 HTML 1회 다운로드: 스트리밍으로 max_bytes까지만 읽음 -> (응답 또는 None, HTML 또는 None)
+# 304/오류 응답은 HTML 없이 응답만 반환
+def fetch_html(url, headers=None, timer=None, max_bytes=MAX_HTML_BYTES):
+    timer = timer or RunTimer()
+    headers = dict({'User-Agent': 'Mozilla/5.0'}, **(headers or {}))
+    conditional = 'If-None-Match' in headers or 'If-Modified-Since' in headers
+    with timer.span("scrape.download", conditional=conditional) as sp:
+        try:
+            with get_http_session().get(url, headers=headers, timeout=10, stream=True) as resp:
+                buf = bytearray()
+                if resp.ok:
+                    for chunk in resp.iter_content(64 * 1024):
+                        buf += chunk
+                        if len(buf) >= max_bytes: break
+                sp.update(status=resp.status_code, bytes=len(buf), truncated=len(buf) >= max_bytes)
+                return resp, _decode_html(resp, bytes(buf[:max_bytes])) if resp.ok else None
+        except: return None, None
+
+# 디스크 캐시 공용: 수정 시각 기준으로 오래된 .json부터 삭제
+def _evict_oldest(cache_dir, max_entries):
+    try:
+        files = [os.path.join(cache_dir, n) for n in os.listdir(cache_dir) if n.endswith('.json')]
+        if len(files) <= max_entries: return
+        files.sort(key=os.path.getmtime)
+        for path in files[:len(files) - max_entries]: os.remove(path)
+    except: pass
+
+class ScrapeCache:
+    def __init__(self, cache_dir, ttl, max_entries):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.stats = {'hit': 0, 'revalidated': 0, 'stale': 0, 'miss': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha256(key.encode('utf-8')).hexdigest() + ".json")
+
+    def _load(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f: entry = json.load(f)
+            return entry if entry.get('url') == key else None
+        except: return None
+
+    def _store(self, key, entry):
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f: json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except: pass
+        self._evict()
+
+    def _touch(self, key):
+        try: os.utime(self._path(key))
+        except: pass
+
+    def _evict(self):
+        with self.lock: _evict_oldest(self.cache_dir, self.max_entries)
+
+    def _count(self, kind):
+        with self.lock: self.stats[kind] += 1
+
+    def scrape(self, url, timer=None):
+        timer = timer or RunTimer()
+        with timer.span("scrape") as sp:
+            data, sp["cache"] = self._scrape(url, timer)
+        self._count(sp["cache"])
+        return data
+
+    def _scrape(self, url, timer):
+        key = normalize_url(url)
+        entry = self._load(key)
+        if entry and time.time() - entry['fetched_at'] < self.ttl:
+            self._touch(key)
+            return tuple(entry['data']), 'hit'
+
+        headers = {}
+        if entry and entry.get('etag'): headers['If-None-Match'] = entry['etag']
+        if entry and entry.get('last_modified'): headers['If-Modified-Since'] = entry['last_modified']
+        resp, html = fetch_html(url, headers=headers, timer=timer)
+        if entry and resp is not None and resp.status_code == 304:
+            entry['fetched_at'] = time.time()
+            self._store(key, entry)
+            return tuple(entry['data']), 'revalidated'
+        # 네트워크 실패나 오류 응답(5xx/429 등)이면 만료된 항목으로 대체 (hit과 구분해 집계)
+        if entry and (resp is None or not resp.ok): return tuple(entry['data']), 'stale'
+
+        data = advanced_scrape(url, html=html or "", timer=timer)
+        if len(data[2]) >= 50:
+            self._store(key, {
+                'url': key, 'fetched_at': time.time(),
+                'etag': resp.headers.get('ETag') if resp is not None else None,
+                'last_modified': resp.headers.get('Last-Modified') if resp is not None else None,
+                'data': list(data),
+            })
+        return data, 'miss'
+
+@st.cache_resource
+def get_scrape_cache():
+    return ScrapeCache(SCRAPE_CACHE_DIR, SCRAPE_CACHE_TTL, SCRAPE_CACHE_MAX_ENTRIES)
+
+# ==============================================================================
+# 자산 준비: 서버 프로세스당 1회 백그라운드에서 폰트/로고 검증 + 미리 로드
+# ==============================================================================
+def _file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""): h.update(chunk)
+    return h.hexdigest()
+
+def _matches_pin(path, pin):
+    return os.path.getsize(path) == pin[0] and _file_sha256(path) == pin[1]
+
+def _asset_valid(path, kind):
+    try:
+        if kind == "font": ImageFont.truetype(path, 20)
+        else:
+            with Image.open(path) as im: im.verify()
+        return True
+    except: return False
+
+# 임시 파일로 받아 폰트로 열리는지(고정값이 있으면 크기/해시까지) 확인한 뒤에만 교체 (깨진 파일을 남기지 않음)
+def _download_font(url, filename, pin=None):
+    tmp = filename + ".part"
+    try:
+        resp = requests.get(url, timeout=30)
+        resp.raise_for_status()
+        with open(tmp, "wb") as f: f.write(resp.content)
+        if pin and not _matches_pin(tmp, pin): return False
+        if not _asset_valid(tmp, "font"): return False
+        os.replace(tmp, filename)
+        return True
+    except: return False
+    finally:
+        if os.path.exists(tmp): os.remove(tmp)
+
+def _load_manifest():
+    try:
+        with open(ASSET_MANIFEST_PATH, encoding="utf-8") as f: return json.load(f)
+    except: return {}
+
+def _save_manifest(manifest):
+    try:
+        os.makedirs(os.path.dirname(ASSET_MANIFEST_PATH), exist_ok=True)
+        tmp = f"{ASSET_MANIFEST_PATH}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f: json.dump(manifest, f, ensure_ascii=False, indent=2)
+        os.replace(tmp, ASSET_MANIFEST_PATH)
+    except: pass
+
+# status: ok(고정값/기록과 일치) / verified(새로 검증) / downloaded / invalid / missing
+def check_asset(key, path, kind, manifest, url=None):
+    entry = manifest.get(key)
+    pin = ASSET_PINS.get(key)
+    status = None
+    if os.path.exists(path):
+        info = os.stat(path)
+        # 고정값이 있으면 기록(크기/수정 시각)을 믿지 않고 매번 해시 대조
+        if pin: status = "ok" if _matches_pin(path, pin) else "invalid"
+        elif entry and entry.get("path") == path and entry.get("size") == info.st_size and entry.get("mtime") == info.st_mtime: status = "ok"
+        elif _asset_valid(path, kind): status = "verified"
+        else: status = "invalid"
+        if status == "invalid" and url: os.remove(path)
+    if status in (None, "invalid") and url: status = "downloaded" if _download_font(url, path, pin) else status or "missing"
+    if status is None: status = "missing"
+    if status in ("ok", "verified", "downloaded"):
+        if status != "ok" or pin:
+            info = os.stat(path)
+            entry = {"path": path, "size": info.st_size, "mtime": info.st_mtime, "sha256": pin[1] if pin else _file_sha256(path)}
+        manifest[key] = entry
+    else: manifest.pop(key, None)
+    return dict(manifest.get(key) or {"path": path, "size": None, "sha256": None}, key=key, status=status, pinned=pin is not None)
+
+def prepare_assets():
+    start = time.perf_counter()
+    os.makedirs(FONT_DIR, exist_ok=True)
+    manifest = _load_manifest()
+    entries = [check_asset(f"font:{key}", os.path.join(FONT_DIR, f"{key}.ttf"), "font", manifest, url) for key, url in FONT_SOURCES.items()]
+    entries += [check_asset(f"logo:{os.path.basename(path)}", path, "image", manifest) for path in (LOGO_SYMBOL_PATH, LOGO_TEXT_PATH)]
+    _save_manifest(manifest)
+    ok = {e["key"]: e["status"] in ("ok", "verified", "downloaded") for e in entries}
+    font_paths = {key: os.path.join(FONT_DIR, f"{key}.ttf") if ok[f"font:{key}"] else None for key in FONT_SOURCES}
+    # 인라인 렌더(풀 없음)와 OUTRO 템플릿 등 현재 프로세스용 캐시 예열 (렌더 워커는 AssetWarmup이 따로 예열)
+    warm_render_assets(font_paths, (LOGO_SYMBOL_PATH, LOGO_TEXT_PATH))
+    return {"fonts": font_paths, "entries": entries, "ready": all(ok.values()), "seconds": round(time.perf_counter() - start, 2)}
+
+# 렌더 워커 예열용 폰트 경로: 자산 준비가 끝나면 설정, 이후 새로 만든 풀은 생성 직후 예열
+_worker_font_paths = None
+
+# render_pool: 시작 시 fork해 둔 렌더 풀 (자산 준비가 끝나면 각 워커에도 폰트/로고를 로드한 뒤에 done 설정)
+class AssetWarmup:
+    def __init__(self, render_pool=None):
+        self.render_pool = render_pool
+        self.done = threading.Event()
+        self.report = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        global _worker_font_paths
+        try:
+            report = prepare_assets()
+            _worker_font_paths = report["fonts"]
+            if self.render_pool is not None: report["warm_workers"] = warm_render_pool(self.render_pool, report["fonts"])
+            self.report = report
+        except Exception as e: self.report = {"fonts": {key: None for key in FONT_SOURCES}, "entries": [], "ready": False, "error": str(e)}
+        finally: self.done.set()
+
+    def wait(self, timeout=None):
+        self.done.wait(timeout)
+        return self.report
+
+@st.cache_resource(show_spinner=False)
+def get_asset_warmup():
+    # 렌더 풀은 이보다 먼저(시작 직후) 생성되어 있음
+    return AssetWarmup(get_render_pool())
+
+def load_fonts_local():
+    return get_asset_warmup().wait()["fonts"]
+
+# 풀 이미지 수집: JPEG는 draft로 캔버스 이상 최소 배율만 디코딩 -> 캔버스 크기로 한 번만 축소, 원본은 바로 폐기
+def prepare_pool_image(im, size):
+    if size: im.draft('RGB', size)
+    img = im.convert('RGB')
+    if size and img.size != tuple(size): img = img.resize(size)
+    return img
+
+# (이미지 또는 None, 받은 바이트 수, 원본 바이트)
+def _fetch_pool_image(session, link, stop_event, min_width, size=None):
+    buf = io.BytesIO()
+    if stop_event.is_set(): return None, 0, None
+    try:
+        with session.get(link, timeout=2, stream=True) as r:
+            if r.headers.get('Content-Type', '').startswith(('text/', 'image/svg')): return None, 0, None
+            # 앞부분(IMAGE_PROBE_BYTES)의 헤더로 실제 크기를 먼저 확인: 작은 이미지는 나머지를 받지 않음
+            probe = ImageFile.Parser()
+            for chunk in r.iter_content(16 * 1024):
+                if stop_event.is_set(): return None, buf.tell(), None
+                buf.write(chunk)
+                if probe is None: continue
+                try: probe.feed(chunk)
+                except: probe = None; continue
+                if probe.image is not None:
+                    if probe.image.width < min_width: return None, buf.tell(), None
+                    probe = None
+                elif buf.tell() >= IMAGE_PROBE_BYTES: probe = None
+        nbytes = buf.tell()
+        with Image.open(buf) as im:
+            if im.width < min_width: return None, nbytes, None
+            return prepare_pool_image(im, size), nbytes, buf.getvalue()
+    except: return None, buf.getbuffer().nbytes, None
+    finally: buf.close()
+
+# 후보 이미지 병렬 다운로드: 스크랩 순서 유지, limit장 또는 메모리 상한(budget_mb) 도달 시 나머지 취소
+# sources에 리스트를 넘기면 채택된 이미지의 원본 바이트를 담아 줌 (다른 캔버스 크기로 재디코딩용)
+def fetch_image_pool(links, limit=5, min_width=IMAGE_MIN_WIDTH, workers=IMG_FETCH_WORKERS, timer=None, size=None, budget_mb=None, sources=None):
+    timer = timer or RunTimer()
+    pool = []
+    if not links: return pool
+    budget = (budget_mb or IMAGE_POOL_BUDGET_MB) * 1024 * 1024
+    session = get_http_session()
+    stop_event = threading.Event()
+    executor = ThreadPoolExecutor(max_workers=workers)
+    with timer.span("images", candidates=len(links)) as sp:
+        nbytes = tried = pool_bytes = 0
+        try:
+            futures = [executor.submit(_fetch_pool_image, session, link, stop_event, min_width, size) for link in links]
+            for fut in futures:
+                im, size_bytes, data = fut.result()
+                nbytes += size_bytes
+                tried += 1
+                if im is None: continue
+                im_bytes = im.width * im.height * 3 + len(data)
+                # 최소 한 장은 유지
+                if pool and pool_bytes + im_bytes > budget: break
+                pool.append(im)
+                if sources is not None: sources.append(data)
+                pool_bytes += im_bytes
+                if len(pool) >= limit: break
+        finally:
+            stop_event.set()
+            executor.shutdown(wait=False, cancel_futures=True)
+        sp.update(bytes=nbytes, tried=tried, kept=len(pool), pool_mb=round(pool_bytes / 1024 / 1024, 1))
+    return pool
+
+# 세션에 보관한 원본 바이트 -> 캔버스 크기 풀 이미지 + 내용 해시 (최근 몇 개만 프로세스 공용 LRU로 유지)
+_pool_cache = OrderedDict()
+_pool_lock = threading.Lock()
+
+# 풀 이미지 키: 원본 바이트 + 캔버스 크기의 해시 (풀 이미지는 이 둘로 정해지므로 디코딩 없이 계산)
+def pool_image_key(data, size):
+    digest = hashlib.blake2b(data, digest_size=16)
+    digest.update(f"{size[0]}x{size[1]}".encode())
+    return digest.hexdigest()
+
+def _pool_cache_key(sources, size):
+    digest = hashlib.blake2b(digest_size=16)
+    for data in sources: digest.update(hashlib.blake2b(data, digest_size=16).digest())
+    return digest.hexdigest(), tuple(size)
+
+def remember_pool(sources, size, img_pool, keys):
+    with _pool_lock:
+        _pool_cache[_pool_cache_key(sources, size)] = (img_pool, keys)
+        while len(_pool_cache) > POOL_CACHE_MAX_ENTRIES: _pool_cache.popitem(last=False)
+
+def decode_pool(sources, size):
+    key = _pool_cache_key(sources, size)
+    with _pool_lock:
+        if key in _pool_cache:
+            _pool_cache.move_to_end(key)
+            return _pool_cache[key]
+    img_pool, keys = [], []
+    for data in sources:
+        try:
+            with Image.open(io.BytesIO(data)) as im: img_pool.append(prepare_pool_image(im, size))
+        except: continue
+        keys.append(pool_image_key(data, size))
+    if not img_pool:
+        img_pool.append(Image.new('RGB', tuple(size), '#333'))
+        keys.append(pool_image_key(b"", size))
+    remember_pool(sources, size, img_pool, keys)
+    return img_pool, keys
+
+# 색상 추출은 긴 변 64px 썸네일(BOX 평균)에서 수행, 결과는 (이미지 내용 해시, 모드)별로 재사용
+_color_cache = OrderedDict()
+_color_lock = threading.Lock()
+
+def _color_pixels(pil_img):
+    img = pil_img.convert('RGB')
+    scale = COLOR_THUMB_SIZE / max(img.size)
+    if scale < 1: img = img.resize((max(1, round(img.width * scale)), max(1, round(img.height * scale))), Image.BOX)
+    return np.asarray(img, dtype=np.float32).reshape(-1, 3)
+
+def _vibrant_color(pixels, k=5, iterations=8):
+    # 밝기 분위수로 초기 중심을 잡아 결과가 실행마다 같도록 함
+    luma = pixels @ np.array([0.299, 0.587, 0.114], dtype=np.float32)
+    centers = pixels[np.argsort(luma)[np.linspace(0, len(pixels) - 1, k).astype(int)]]
+    for _ in range(iterations):
+        labels = ((pixels[:, None, :] - centers[None, :, :]) ** 2).sum(-1).argmin(1)
+        for j in range(k):
+            members = pixels[labels == j]
+            if len(members): centers[j] = members.mean(0)
+    counts = np.bincount(labels, minlength=k) / len(pixels)
+    high, low = centers.max(1), centers.min(1)
+    saturation = np.where(high > 0, (high - low) / np.maximum(high, 1), 0)
+    value = high / 255
+    # 비중 x (채도 + 0.2), 너무 어둡거나 너무 밝은 군집은 감점
+    score = counts * (saturation + 0.2) * np.clip(1.2 - np.abs(value - 0.6) * 1.5, 0.1, 1)
+    return centers[score.argmax()]
+
+def get_dominant_color(pil_img, key=None, mode="average"):
+    cache_key = (key, mode) if key else None
+    if cache_key:
+        with _color_lock:
+            if cache_key in _color_cache:
+                _color_cache.move_to_end(cache_key)
+                return _color_cache[cache_key]
+    try:
+        pixels = _color_pixels(pil_img)
+        c = _vibrant_color(pixels) if mode == "vibrant" else pixels.mean(0)
+        color = "#" + "".join(f"{int(v + 0.5):02x}" for v in np.clip(c, 0, 255))
+    except: return "#FFD700"
+    if cache_key:
+        with _color_lock:
+            _color_cache[cache_key] = color
+            while len(_color_cache) > COLOR_CACHE_MAX_ENTRIES: _color_cache.popitem(last=False)
+    return color
+
+# 모델마다 해당 키로 만든 클라이언트를 직접 지정: genai.configure(전역 기본 클라이언트)는 세션 간에 공유되므로 사용하지 않음
+def _bind_model(model_name, api_key):
+    model = genai.GenerativeModel(model_name)
+    model._client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+    return model
+
+# API 키별 모델 탐색 결과 + GenerativeModel 캐시 (TTL, 실패 시 캐시하지 않음)
+@st.cache_resource(ttl=MODEL_CACHE_TTL, show_spinner=False)
+def _load_model(api_key):
+    client = glm.ModelServiceClient(client_options={"api_key": api_key})
+    models = [m.name for m in genai.list_models(client=client) if 'generateContent' in m.supported_generation_methods]
+    model_name = models[0] if models else DEFAULT_MODEL
+    return model_name, _bind_model(model_name, api_key)
+
+def get_model(api_key, refresh=False):
+    if refresh: _load_model.clear(api_key)
+    try: return _load_model(api_key)
+    except: return DEFAULT_MODEL, _bind_model(DEFAULT_MODEL, api_key)
+
+def validate_hex_color(c):
+    match = re.search(r'#(?:[0-9a-fA-F]{3}){1,2}', str(c))
+    return match.group(0) if match else "#FFD700"
+
+# [SLIDE n] 블록 단위 증분 파서: 청크를 받아 완성된 슬라이드만 반환
+class SlidePlanParser:
+    def __init__(self):
+        self.ai_color = "#FFD700"
+        self.hashtags = ""
+        self.count = 0
+        self.finished = False
+        self.curr = {}
+        self.mode = None
+        self.buffer = ""
+
+    def _parse_line(self, line):
+        line = line.strip()
+        if not line: return None
+        done = None
+        if line.startswith("COLOR_MAIN:"): self.ai_color = validate_hex_color(line.split(":")[1])
+        elif line.startswith("HASHTAGS:"): self.hashtags = line.split(":", 1)[1].strip()
+        elif "[SLIDE" in line:
+            if self.curr: done = self.curr
+            self.curr = {"HEAD":"", "DESC":"", "TYPE":"BOX"}
+            self.mode = None
+        elif line.startswith("TYPE:"): self.curr["TYPE"] = line.split(":", 1)[1].strip()
+        elif line.startswith("HEAD:"):
+            self.curr["HEAD"] = line.split(":", 1)[1].strip()
+            self.mode = "HEAD"
+        elif line.startswith("DESC:"):
+            self.curr["DESC"] = line.split(":", 1)[1].strip()
+            self.mode = "DESC"
+        else:
+            if self.mode == "DESC" and self.curr: self.curr["DESC"] += " " + line
+            elif self.mode == "HEAD" and self.curr: self.curr["HEAD"] += " " + line
+        if done: self.count += 1
+        return done
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        *lines, self.buffer = self.buffer.split('\n')
+        return [s for s in map(self._parse_line, lines) if s]
+
+    def close(self):
+        done = self.feed('\n')
+        if self.curr:
+            done.append(self.curr)
+            self.count += 1
+            self.curr = {}
+        return done
+
+    def parse_stream(self, chunks):
+        for chunk in chunks: yield from self.feed(chunk)
+        yield from self.close()
+        self.finished = True
+
+# 고정 SLIDE_COUNT장 기획: 마지막 장은 OUTRO, 모자라면 BOX로 채움
+def iter_slide_plan(chunks, parser, total=SLIDE_COUNT):
+    outro = {"TYPE": "OUTRO", "HEAD":"", "DESC":""}
+    produced = 0
+    for slide in parser.parse_stream(chunks):
+        if produced >= total - 1: continue
+        yield slide
+        produced += 1
+        if produced == total - 1: yield outro
+    if parser.count == 0: raise PlanError("AI 생성 실패.")
+    if produced < total - 1:
+        for _ in range(total - 1 - produced): yield {"TYPE": "BOX", "HEAD":"", "DESC":""}
+        yield outro
+
+# 응답 종료 사유 (STOP이 아니면 MAX_TOKENS/SAFETY 등으로 잘린 응답), 알 수 없으면 None
+def finish_reason(response):
+    try: name = response.candidates[0].finish_reason.name
+    except: return None
+    return None if name == "FINISH_REASON_UNSPECIFIED" else name
+
+# status: {"skipped": 텍스트 없는 청크 수, "finish": 종료 사유}를 기록 (기획안 캐시 여부 판단용)
+def iter_response_text(response, status):
+    for chunk in response:
+        status["finish"] = finish_reason(chunk) or status["finish"]
+        try: text = chunk.text
+        except:
+            status["skipped"] += 1
+            continue
+        yield text
+
+# 슬라이드 렌더링용 프로세스 풀 (서버 프로세스당 1개)
+# fork: spawn/forkserver는 스트림릿 스크립트(__main__)를 워커에서 다시 실행함. fork가 없으면(Windows) None -> 인라인 렌더
+# 워커는 생성 시점에 한꺼번에 fork: 앱/배치 시작 직후(이미지/인코딩/준비 스레드가 생기기 전)에 호출해 둘 것
+@st.cache_resource(show_spinner=False)
+def get_render_pool():
+    if RENDER_PROCESSES <= 1: return None
+    try: context = multiprocessing.get_context('fork')
+    except ValueError: return None
+    pool = ProcessPoolExecutor(max_workers=RENDER_PROCESSES, mp_context=context, initializer=init_render_worker, initargs=(context.Barrier(RENDER_PROCESSES),))
+    try: pool.submit(int).result()
+    except BrokenProcessPool: return None
+    if _worker_font_paths is not None: warm_render_pool(pool, _worker_font_paths)
+    return pool
+
+# 워커마다 한 번씩 폰트/로고 예열, 반환: 예열된 워커 수
+def warm_render_pool(pool, font_paths):
+    try:
+        futures = [pool.submit(warm_render_assets, font_paths, (LOGO_SYMBOL_PATH, LOGO_TEXT_PATH)) for _ in range(RENDER_PROCESSES)]
+        return len({fut.result() for fut in futures})
+    except BrokenProcessPool: return 0
+
+def _done(value):
+    fut = Future()
+    fut.set_result(value)
+    return fut
+
+# 워커가 죽어 깨진 풀: 실행 중에는 다시 fork하지 않고 (다른 실행의 스레드가 잡은 락까지 복사됨)
+# 진행 중인 실행이 하나도 없을 때 시작하는 다음 실행에서 새로 생성
+_run_lock = threading.Lock()
+_active_runs = 0
+_render_pool_broken = False
+
+# 실행 1회(생성/재렌더)가 쓸 렌더 풀: 실행 시작 시점에 정하고 끝날 때까지 유지 (깨진 뒤면 None -> 인라인 렌더)
+@contextmanager
+def render_run():
+    global _active_runs, _render_pool_broken
+    with _run_lock:
+        if _render_pool_broken and _active_runs == 0: _render_pool_broken = False
+        pool = None if _render_pool_broken else get_render_pool()
+        _active_runs += 1
+    try: yield pool
+    finally:
+        with _run_lock: _active_runs -= 1
+
+def discard_render_pool(pool):
+    global _render_pool_broken
+    with _run_lock:
+        _render_pool_broken = True
+        get_render_pool.clear()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+# --- 프롬프트 압축 + 기획안 캐시 (정규화한 프롬프트 해시 키) ---
+HANGUL_CJK = re.compile(r'[\u1100-\u11FF\u3130-\u318F\uAC00-\uD7A3\u4E00-\u9FFF]')
+# 줄 전체가 상투 문구인 경우만 (본문 문장이 '구독', '광고' 등을 포함하는 경우는 유지)
+BOILERPLATE_LINE = re.compile(r"""^(?:
+    (?:[ⓒ©]|\(c\)|copyright\b|저작권자).*                        # 저작권 줄
+  | .{0,30}무단\s*전재.{0,30}
+  | [가-힣]{2,5}\s*(?:기자|특파원)?\s*[\w.+-]+@[\w-]+(?:\.[\w-]+)+  # 기자 바이라인/이메일 줄
+  | [\w.+-]+@[\w-]+(?:\.[\w-]+)+
+  | [\[(<▶■·]?\s*(?:구독(?:하기)?|로그인|회원가입|많이\s*본\s*(?:뉴스|기사)|관련\s*기사|바로\s*가기|공유하기|
+        댓글(?:\s*\d+)?|기사\s*제보|광고|좋아요|스크랩|인쇄|글자\s*크기)\s*[\])>]?  # 메뉴 항목
+)$""", re.I | re.X)
+BOILERPLATE_MAX_LINE = 80
+
+# 대략적인 토큰 수: 한글/한자는 글자당 1, 그 외는 4글자당 1
+def estimate_tokens(text):
+    cjk = len(HANGUL_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+# 문장부호로 끝나지 않는 아주 짧은 줄(이동 경로, 메뉴 조각)도 제외
+def is_boilerplate_line(line):
+    if len(line) < 12 and not line.endswith(('.', '!', '?', '"', "'")): return True
+    return len(line) <= BOILERPLATE_MAX_LINE and BOILERPLATE_LINE.match(line) is not None
+
+# 본문에서 메뉴/저작권/기자 이메일 줄과 중복 문장을 빼고 앞에서부터 budget 토큰까지만 사용
+def compact_article_text(text, budget=PROMPT_TEXT_TOKENS):
+    kept, seen, used = [], set(), 0
+    lines = (line.strip() for line in text.split('\n'))
+    sentences = (sentence for line in lines if not is_boilerplate_line(line) for sentence in re.split(r'(?<=[.!?])\s+', line))
+    for sentence in sentences:
+        if not sentence or sentence in seen: continue
+        seen.add(sentence)
+        cost = estimate_tokens(sentence) + 1
+        if used + cost > budget:
+            # 첫 문장부터 budget을 넘으면 그 문장을 잘라서라도 사용
+            if not kept: kept.append(sentence[:budget])
+            break
+        kept.append(sentence)
+        used += cost
+    return ' '.join(kept)
+
+def build_prompt(title, text):
+    return f"""
+            당신은 세계일보 전문 에디터입니다. 기사를 읽고 SNS용 카드뉴스 8장을 기획하세요.
+            [제목] {title}
+            [내용] {compact_article_text(text)}
+            
+            [레이아웃 결정 규칙]
+            1. **TYPE: QUOTE** (인용/발언)
+            2. **TYPE: DATA** (숫자/통계)
+            3. **TYPE: BAR** (요약/명제)
+            4. **TYPE: BOX** (일반 서술)
+            
+            [필수 규칙]
+            1. **SLIDE 1 (COVER):** HEAD는 15자 이내 훅, DESC는 40자 이내.
+            2. **SLIDE 2~7 (CONTENT):** 각 장의 DESC(본문)는 **90자~110자(약 3줄)로 작성**. 넘치지 않게.
+            3. **SLIDE 8 (OUTRO):** 고정.
+            4. 해시태그 5개 추천.
+            
+            [출력형식]
+            COLOR_MAIN: #Hex
+            HASHTAGS: #태그
+            
+            [SLIDE 1]
+            TYPE: COVER
+            HEAD: ...
+            DESC: ...
+            ...
+            """
+
+# 공백/유니코드 정규화한 프롬프트 + 프롬프트 버전의 해시 (기사 URL과 무관: 같은 내용이면 같은 기획안)
+def plan_cache_key(prompt):
+    normalized = re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', prompt)).strip()
+    return hashlib.sha256(f"v{PROMPT_VERSION}\n{normalized}".encode('utf-8')).hexdigest()
+
+# 파싱된 기획안(slides/ai_color/hashtags/model)을 키별 JSON 파일로 보관, 개수 초과 시 오래 안 쓴 것부터 삭제
+# created_at 기준 ttl이 지난 기획안은 miss (파일 수정 시각은 LRU 정리용으로만 갱신)
+class PlanCache:
+    def __init__(self, cache_dir, ttl, max_entries):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.stats = {'hit': 0, 'miss': 0}
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".json")
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f: plan = json.load(f)
+            if time.time() - plan['created_at'] >= self.ttl: plan = None
+            else: os.utime(self._path(key))
+        except: plan = None
+        with self.lock: self.stats['hit' if plan else 'miss'] += 1
+        return plan
+
+    def put(self, key, plan):
+        path = self._path(key)
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f: json.dump(dict(plan, created_at=time.time()), f, ensure_ascii=False)
+            os.replace(tmp, path)
+        except: pass
+        with self.lock: _evict_oldest(self.cache_dir, self.max_entries)
+
+@st.cache_resource
+def get_plan_cache():
+    return PlanCache(PLAN_CACHE_DIR, PLAN_CACHE_TTL, PLAN_CACHE_MAX_ENTRIES)
+
+# 카드 1장 인코딩: 결과 바이트를 미리보기와 ZIP에 그대로 재사용
+def encode_card(img, output_format="PNG", png_compress_level=6, quality=90):
+    buf = io.BytesIO()
+    if output_format == "JPEG": img.convert("RGB").save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+    elif output_format == "WEBP": img.save(buf, format="WEBP", quality=quality, method=4)
+    else: img.save(buf, format="PNG", compress_level=png_compress_level)
+    return buf.getvalue()
+
+# 미리보기: 긴 변 PREVIEW_SIZE px JPEG (UI 탭 표시용, 원본 카드는 ZIP에만)
+def make_preview(img, size=None):
+    thumb = img.convert("RGB")
+    thumb.thumbnail((size or PREVIEW_SIZE, size or PREVIEW_SIZE))
+    buf = io.BytesIO()
+    thumb.save(buf, format="JPEG", quality=80)
+    return buf.getvalue()
+
+# (카드 바이트, 미리보기 바이트, 초): 인코딩이 끝나면 캔버스는 바로 버려짐
+def _encode_card_timed(img, output_format, png_compress_level, quality):
+    t0 = time.perf_counter()
+    data = encode_card(img, output_format, png_compress_level, quality)
+    return data, make_preview(img), time.perf_counter() - t0
+
+# 인코딩은 GIL을 놓으므로 스레드 풀로 충분 (프로세스당 1개)
+@st.cache_resource(show_spinner=False)
+def get_encode_pool():
+    return ThreadPoolExecutor(max_workers=ENCODE_WORKERS, thread_name_prefix="encode")
+
+def card_filename(index, ext="png"):
+    return f"card_{index+1:02d}.{ext}"
+
+# 카드를 도착하는 대로 ZIP에 기록 (카드 목록을 따로 모아 두지 않음). target: 파일 객체/경로, None이면 메모리
+class CardZipWriter:
+    def __init__(self, ext="png", target=None):
+        self.in_memory = target is None
+        self.buf = io.BytesIO() if self.in_memory else target
+        self.zf = zipfile.ZipFile(self.buf, "w")
+        self.ext = ext
+        self.count = 0
+
+    def add(self, index, data):
+        self.zf.writestr(card_filename(index, self.ext), data)
+        self.count += 1
+
+    # 메모리 대상이면 ZIP 바이트 반환: 쓰기가 끝난 BytesIO의 getvalue()는 내부 버퍼를 복사하지 않고 넘겨줌
+    def close(self):
+        self.zf.close()
+        return self.buf.getvalue() if self.in_memory else None
+
+# cards: 인코딩된 카드 바이트 목록 (재인코딩 없이 묶기만 함). target을 넘기면 그곳에 기록하고 None 반환
+def build_zip(cards, ext="png", timer=None, target=None):
+    timer = timer or RunTimer()
+    with timer.span("zip", cards=len(cards)) as sp:
+        writer = CardZipWriter(ext, target)
+        for i, data in enumerate(cards): writer.add(i, data)
+        zip_bytes = writer.close()
+        if zip_bytes is not None: sp["bytes"] = len(zip_bytes)
+    return zip_bytes
+
+# build_zip의 역: 파일명 순서대로 카드 바이트를 하나씩
+def iter_zip_cards(zip_bytes):
+    with zipfile.ZipFile(io.BytesIO(zip_bytes)) as zf:
+        for name in sorted(zf.namelist()): yield zf.read(name)
+
+# 풀 이미지 배경(표지용 COVER + 본문용 BLUR)을 AI 응답을 기다리는 동안 미리 가공: {(풀 인덱스, 종류): 배경}
+# 슬라이드 i는 풀[i % n]을 쓰고, 보통 첫 장이 표지, 마지막 장이 OUTRO
+# 같은 사진의 재실행은 렌더러의 배경 LRU에서 바로 가져옴
+def prebuild_backgrounds(img_pool, pool_keys, size, fast_blur=False, timer=None):
+    timer = timer or RunTimer()
+    jobs = [(0, 'COVER')] + sorted({(i % len(img_pool), 'BLUR') for i in range(1, SLIDE_COUNT - 1)})
+    with timer.span("backgrounds", count=len(jobs), fast_blur=fast_blur):
+        return {(k, kind): get_background(img_pool[k], pool_keys[k], size[0], size[1], kind, fast_blur) for k, kind in jobs}
+
+# 카드 지문: 렌더 입력(슬라이드/색상/태그/링크/블러/배경/캔버스) + 인코딩 옵션. 같으면 이전 카드 바이트 재사용
+def card_fingerprint(spec, background_key, canvas, encode_args):
+    payload = json.dumps([spec, background_key, canvas, encode_args], ensure_ascii=False, sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+# 렌더 단계: slides(스트리밍 반복자 가능)를 도착 순서대로 프로세스 풀에 제출 -> 렌더 완료분은 인코딩 풀로
+# -> 인코딩 완료분을 on_card로 전달. ctx: tag/link/color/pool/pool_keys/font_paths(/backgrounds/render_pool), previous: {지문: (카드 바이트, 미리보기)}
+# 반환: (슬라이드 목록, 카드 목록, 미리보기 목록, 지문 목록, ZIP 바이트 또는 None)
+def render_cards(slides, ctx, opts, on_card=None, timer=None, previous=None):
+    timer = timer or RunTimer()
+    previous = previous or {}
+    canvas_w, canvas_h, is_story = CANVAS_FORMATS[opts["format"]]
+    assets = {"font_paths": ctx["font_paths"], "logo_paths": (LOGO_SYMBOL_PATH, LOGO_TEXT_PATH)}
+    canvas = (canvas_w, canvas_h, is_story)
+    encode_args = (opts["output_format"], opts["png_compress_level"], opts["quality"])
+    img_pool, pool_keys = ctx["pool"], ctx["pool_keys"]
+    backgrounds = ctx.get("backgrounds") or {}
+    encode_pool = get_encode_pool()
+    render_pool = ctx.get("render_pool")
+    # 워커가 죽으면 풀을 버리고 이번 실행의 나머지 슬라이드는 현재 프로세스에서 렌더
+    def drop_render_pool():
+        nonlocal render_pool
+        if render_pool is not None: discard_render_pool(render_pool)
+        render_pool = None
+    done_slides, fingerprints, futures, encode_futures, cards, previews = [], [], [], [], [], []
+    reused, render_args = set(), {}
+    writer = CardZipWriter(OUTPUT_FORMATS[opts["output_format"]][0]) if opts["zip"] else None
+    # wait_until: 앞에서부터 이 개수만큼 카드가 나올 때까지 대기 (0이면 이미 끝난 것만 수거)
+    def collect_ready(wait_until=0):
+        while len(encode_futures) < len(futures) and (len(encode_futures) < wait_until or futures[len(encode_futures)].done()):
+            k = len(encode_futures)
+            if k in reused: encode_futures.append(futures[k])
+            else:
+                try: img, timings = futures[k].result()
+                except BrokenProcessPool:
+                    drop_render_pool()
+                    img, timings = render_slide_timed(*render_args[k])
+                futures[k] = None
+                render_args.pop(k, None)
+                timer.record("render.slide", timings.pop('ms') / 1000, index=k, **timings)
+                encode_futures.append(encode_pool.submit(_encode_card_timed, img, *encode_args))
+        while len(previews) < len(encode_futures) and (len(previews) < wait_until or encode_futures[len(previews)].done()):
+            k = len(previews)
+            data, preview, seconds = encode_futures[k].result()
+            encode_futures[k] = None
+            if k not in reused: timer.record("encode.card", seconds, index=k, format=opts["output_format"], bytes=len(data))
+            if writer: writer.add(k, data)
+            if on_card: on_card(k, data, preview)
+            if opts["keep_cards"]: cards.append(data)
+            previews.append(preview)
+
+    for i, slide in enumerate(slides):
+        spec = {"slide": slide, "index": i, "total": SLIDE_COUNT, "color": ctx["color"], "tag": ctx["tag"], "link": ctx["link"], "fast_blur": opts["fast_blur"]}
+        slide_type = slide.get('TYPE', 'BOX').upper()
+        if slide_type == 'OUTRO': bg, bg_key = None, None
+        else: bg, bg_key = img_pool[i % len(img_pool)], pool_keys[i % len(img_pool)]
+        fingerprint = card_fingerprint(spec, bg_key, canvas, encode_args)
+        # 미리 가공된 배경이 있으면 렌더러는 가공 단계를 건너뜀
+        prepared = backgrounds.get((i % len(img_pool), 'COVER' if slide_type == 'COVER' else 'BLUR')) if bg is not None else None
+        done_slides.append(slide)
+        fingerprints.append(fingerprint)
+        if fingerprint in previous:
+            reused.add(i)
+            futures.append(_done((*previous[fingerprint], 0.0)))
+            continue
+        # 렌더/인코딩 중인 캔버스가 MAX_CARDS_IN_FLIGHT장이면 가장 앞 카드가 나올 때까지 대기
+        collect_ready(wait_until=len(futures) - MAX_CARDS_IN_FLIGHT + 1)
+        if prepared is not None: render_args[i] = (spec, dict(assets, background=prepared, background_key=bg_key, background_ready=True), canvas)
+        else: render_args[i] = (spec, dict(assets, background=bg, background_key=bg_key), canvas)
+        future = None
+        if render_pool is not None:
+            try: future = render_pool.submit(render_slide_timed, *render_args[i])
+            except BrokenProcessPool: drop_render_pool()
+        futures.append(future or _done(render_slide_timed(*render_args[i])))
+        collect_ready()
+    with timer.span("render.wait", reused=len(reused)): collect_ready(wait_until=len(futures))
+    zip_bytes = None
+    if writer:
+        with timer.span("zip", cards=writer.count) as sp:
+            zip_bytes = writer.close()
+            sp["bytes"] = len(zip_bytes)
+    return done_slides, cards, previews, fingerprints, zip_bytes
+
+# ==============================================================================
+# [4] 파이프라인: 스크랩 -> AI 기획 -> 렌더링 (UI/배치 공용)
+# ==============================================================================
+# 진행 중 실행 레지스트리: 키별로 첫 요청(leader)만 실행, 나머지(follower)는 결과/예외를 그대로 받음
+class SingleFlight:
+    def __init__(self, ttl=SINGLE_FLIGHT_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.inflight = {}
+        self.results = {}
+
+    # 반환: (결과, 'leader'|'follower'|'cached')
+    def run(self, key, fn, on_wait=None):
+        with self.lock:
+            now = time.time()
+            for k in [k for k, (t, _) in self.results.items() if now - t > self.ttl]: del self.results[k]
+            if key in self.results: return self.results[key][1], "cached"
+            fut = self.inflight.get(key)
+            leader = fut is None
+            if leader: fut = self.inflight[key] = Future()
+        if not leader:
+            if on_wait: on_wait()
+            return fut.result(), "follower"
+        try: result = fn()
+        except BaseException as e:
+            with self.lock: del self.inflight[key]
+            # 스트림릿 중단(rerun/stop)은 대기 중인 다른 세션에 그대로 넘기지 않음
+            fut.set_exception(e if isinstance(e, Exception) else RuntimeError("같은 기사의 앞선 생성 작업이 중단되었습니다"))
+            raise
+        with self.lock:
+            del self.inflight[key]
+            self.results[key] = (time.time(), result)
+        fut.set_result(result)
+        return result, "leader"
+
+@st.cache_resource(show_spinner=False)
+def get_single_flight():
+    return SingleFlight()
+
+def single_flight_key(url, opts):
+    image = hashlib.blake2b(opts["user_image"], digest_size=16).hexdigest() if opts["user_image"] else None
+    return (normalize_url(url), opts["format"], image, opts["auto_color"], opts["color_mode"], opts["fast_blur"],
+            opts["output_format"], opts["png_compress_level"], opts["quality"], opts["image_budget_mb"], opts["zip"], opts["keep_cards"])
+
+# on_status(msg): 단계 알림, on_card(i, data, preview): 카드가 순서대로 인코딩될 때마다 호출 (preview: 작은 JPEG)
+# timer: RunTimer를 넘기면 단계별 소요 시간/바이트/캐시 적중을 기록
+# 같은 키의 실행이 이미 진행 중이면 그 결과를 기다렸다가 카드를 한 번에 on_card로 전달
+def generate_cards(url, options=None, on_status=None, on_card=None, timer=None):
+    opts = dict(DEFAULT_OPTIONS, **(options or {}))
+    notify = on_status or (lambda msg: None)
+    timer = timer or RunTimer()
+    with render_run() as render_pool:
+        run = lambda: _generate_cards(url, opts, notify, on_card, timer, render_pool)
+        # 카드도 ZIP도 남기지 않는 실행(on_card로 바로 기록)은 결과를 공유할 수 없고, 기획 새로 받기는 공유하면 안 되므로 단독 실행
+        if (not opts["keep_cards"] and not opts["zip"]) or opts["plan_refresh"]: return dict(run(), shared=False)
+        t0 = time.perf_counter()
+        on_wait = lambda: notify("🔁 같은 기사를 생성 중인 요청이 있어 결과를 기다리는 중...")
+        result, role = get_single_flight().run(single_flight_key(url, opts), run, on_wait)
+    timer.meta["single_flight"] = role
+    if role != "leader":
+        timer.record("single_flight.wait", time.perf_counter() - t0, at=t0, role=role)
+        if on_card:
+            cards = result["cards"] or iter_zip_cards(result["zip"])
+            for i, (data, preview) in enumerate(zip(cards, result["previews"])): on_card(i, data, preview)
+    return dict(result, shared=role != "leader")
+
+def _generate_cards(url, opts, notify, on_card, timer, render_pool=None):
+    canvas_w, canvas_h, is_story = CANVAS_FORMATS[opts["format"]]
+
+    notify("📰 기사 분석 중...")
+    news_tag, title, text, scraped_images = get_scrape_cache().scrape(url, timer=timer)
+    if len(text) < 50: raise ScrapeError("본문 추출 실패")
+
+    # --- AI 기획 요청과 렌더 준비(폰트/이미지/색상/배경)를 동시에 실행, 렌더링 직전에 합류 ---
+    notify("🤖 AI 기획 + 이미지 준비 중...")
+    plan_parser = SlidePlanParser()
+    prompt = build_prompt(title, text)
+    plan_key = plan_cache_key(prompt)
+    plan_stream = {"skipped": 0, "finish": None}
+    # -> (모델명, 응답 청크 또는 None, 캐시된 기획안 또는 None)
+    def request_plan():
+        with timer.span("plan.request", streaming=opts["streaming"], prompt_chars=len(prompt), prompt_tokens=estimate_tokens(prompt)) as sp:
+            use_cache = opts["plan_cache"] and not opts["plan_refresh"]
+            cached = get_plan_cache().get(plan_key) if use_cache else None
+            sp["cache"] = "hit" if cached else "miss" if use_cache else "refresh" if opts["plan_cache"] else "off"
+            if cached: return cached["model"], None, cached
+            model_name, model = get_model(opts["api_key"])
+            sp["model"] = model_name
+            # 스트리밍: 응답을 받는 동안 완성된 슬라이드부터 바로 렌더링
+            if opts["streaming"]: return model_name, iter_response_text(model.generate_content(prompt, stream=True), plan_stream), None
+            response = model.generate_content(prompt)
+            plan_stream["finish"] = finish_reason(response)
+            return model_name, [response.text], None
+
+    def load_assets():
+        # 서버 시작 시 준비가 끝나 있으면 대기 없음 (배포 직후 첫 요청만 남은 준비 시간만큼 대기)
+        with timer.span("assets") as sp:
+            sp["warm"] = get_asset_warmup().done.is_set()
+            return load_fonts_local()
+
+    def prepare_images():
+        # 원본 바이트는 결과에 남겨 두고 (재렌더용), 디코딩한 풀은 풀 캐시에 등록
+        sources, img_pool = [], []
+        if opts["user_image"]: sources.append(opts["user_image"])
+        else: img_pool = fetch_image_pool(scraped_images, limit=5, min_width=IMAGE_MIN_WIDTH, timer=timer, size=(canvas_w, canvas_h), budget_mb=opts["image_budget_mb"], sources=sources)
+        if img_pool:
+            # 배경/색상 캐시 키: 원본 바이트 해시 (재실행/세션 간 동일 사진 재사용)
+            pool_keys = [pool_image_key(data, (canvas_w, canvas_h)) for data in sources]
+            remember_pool(sources, (canvas_w, canvas_h), img_pool, pool_keys)
+        else: img_pool, pool_keys = decode_pool(sources, (canvas_w, canvas_h))
+        return sources, img_pool, pool_keys
+
+    def extract_color(images):
+        _, img_pool, pool_keys = images
+        with timer.span("dominant_color", enabled=opts["auto_color"], mode=opts["color_mode"]):
+            return get_dominant_color(img_pool[0], pool_keys[0], opts["color_mode"]) if opts["auto_color"] else None
+
+    def prebuild(images):
+        _, img_pool, pool_keys = images
+        return prebuild_backgrounds(img_pool, pool_keys, (canvas_w, canvas_h), opts["fast_blur"], timer)
+
+    graph = TaskGraph()
+    try:
+        graph.add("plan", request_plan)
+        graph.add("assets", load_assets)
+        graph.add("images", prepare_images)
+        graph.add("color", extract_color, deps=["images"])
+        graph.add("backgrounds", prebuild, deps=["images"])
+        try: model_name, plan_chunks, cached_plan = graph.result("plan")
+        except Exception as e: raise PlanError(str(e)) from e
+        with timer.span("prepare.join"):
+            font_paths = graph.result("assets")
+            sources, img_pool, pool_keys = graph.result("images")
+            color_main = graph.result("color")
+            backgrounds = graph.result("backgrounds")
+    finally: graph.shutdown()
+    if cached_plan:
+        plan_parser.ai_color, plan_parser.hashtags = cached_plan["ai_color"], cached_plan["hashtags"]
+        slide_plan = [dict(slide) for slide in cached_plan["slides"]]
+    else: slide_plan = timed_iter(iter_slide_plan(plan_chunks, plan_parser), timer, "plan.stream")
+
+    # --- 렌더링 ---
+    notify("🎨 이미지 생성 중...")
+    ctx = {"tag": news_tag, "link": url, "color": color_main, "pool": img_pool, "pool_keys": pool_keys, "font_paths": font_paths, "backgrounds": backgrounds, "render_pool": render_pool}
+    def with_ai_color(slides):
+        for slide in slides:
+            # COLOR_MAIN은 첫 슬라이드 블록보다 먼저 출력됨
+            if ctx["color"] is None: ctx["color"] = plan_parser.ai_color
+            yield slide
+    slides, cards, previews, fingerprints, zip_bytes = render_cards(with_ai_color(slide_plan), ctx, opts, on_card, timer)
+    # 기획안은 응답을 끝까지 정상 수신(빠진 청크 없음, 잘리지 않음)하고 슬라이드를 거의 다 채운 경우만 보관
+    # (모자란 장을 빈 BOX로 채운 기획안은 다음 요청에서 다시 받도록)
+    stream_ok = plan_parser.finished and not plan_stream["skipped"] and plan_stream["finish"] in (None, "STOP")
+    if opts["plan_cache"] and not cached_plan and stream_ok and plan_parser.count >= SLIDE_COUNT - 1:
+        get_plan_cache().put(plan_key, {"model": model_name, "ai_color": plan_parser.ai_color, "hashtags": plan_parser.hashtags, "slides": slides})
+
+    return {
+        "url": url, "tag": news_tag, "title": title, "model": model_name,
+        "color": ctx["color"], "ai_color": plan_parser.ai_color, "hashtags": plan_parser.hashtags,
+        "slides": slides, "sources": sources, "cards": cards, "previews": previews, "fingerprints": fingerprints, "zip": zip_bytes,
+        "render_options": render_options(opts), "ext": OUTPUT_FORMATS[opts["output_format"]][0], "mime": OUTPUT_FORMATS[opts["output_format"]][1],
+    }
+
+def render_options(opts):
+    return {key: opts[key] for key in RENDER_OPTION_KEYS}
+
+# 세션에 보관한 결과(기획/원본 이미지/카드)로 렌더 단계만 다시 실행: 수정된 슬라이드나 바뀐 옵션의 카드만 새로 렌더
+# slides: 수정된 슬라이드 (None이면 보관된 슬라이드 그대로)
+def rerender_cards(project, options=None, on_card=None, timer=None, slides=None):
+    opts = dict(DEFAULT_OPTIONS, **(options or {}))
+    timer = timer or RunTimer()
+    # 슬라이드와 렌더 옵션이 그대로면 (다른 위젯으로 인한 재실행) 디코딩/지문 계산/ZIP 재작성 없이 그대로 반환
+    if (slides is None or slides == project["slides"]) and render_options(opts) == project.get("render_options"): return project
+    if slides is not None: project = dict(project, slides=slides)
+    canvas_w, canvas_h, _ = CANVAS_FORMATS[opts["format"]]
+    font_paths = load_fonts_local()
+    with timer.span("images", source="session"):
+        img_pool, pool_keys = decode_pool(project["sources"], (canvas_w, canvas_h))
+    color_main = get_dominant_color(img_pool[0], pool_keys[0], opts["color_mode"]) if opts["auto_color"] else project["ai_color"]
+    ctx = {"tag": project["tag"], "link": project["url"], "color": color_main, "pool": img_pool, "pool_keys": pool_keys, "font_paths": font_paths}
+    # 이전 카드는 카드 목록이 없으면 이전 ZIP에서 꺼냄
+    old_cards = project["cards"] or iter_zip_cards(project["zip"])
+    previous = dict(zip(project["fingerprints"], zip(old_cards, project["previews"])))
+    with render_run() as ctx["render_pool"]:
+        slides, cards, previews, fingerprints, zip_bytes = render_cards(project["slides"], ctx, opts, on_card, timer, previous)
+    return dict(project, color=color_main, slides=slides, cards=cards, previews=previews, fingerprints=fingerprints, zip=zip_bytes,
+                render_options=render_options(opts), ext=OUTPUT_FORMATS[opts["output_format"]][0], mime=OUTPUT_FORMATS[opts["output_format"]][1])
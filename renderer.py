@@ -0,0 +1,511 @@
+from PIL import Image, ImageDraw, ImageFont, ImageFilter, ImageEnhance, ImageStat
+import functools
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+import qrcode
+import re
+
+FONT_CACHE_MAX_ENTRIES = 64
+BACKGROUND_CACHE_MAX_ENTRIES = 12
+LAYOUT_CACHE_MAX_ENTRIES = 8192
+
+# ==============================================================================
+# [1] 유틸리티 및 그리기 함수
+# ==============================================================================
+
+def is_color_dark(hex_color):
+    try:
+        hex_color = str(hex_color).lstrip('#')
+        rgb = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+        return (0.299 * rgb[0] + 0.587 * rgb[1] + 0.114 * rgb[2]) < 128
+    except: return False
+
+def clean_text_spacing(text):
+    if not text: return ""
+    text = text.strip()
+    # 빈 괄호 및 다중 공백 제거
+    text = text.replace("고( )", "고").replace("고()", "고")
+    text = re.sub(r'고\s*\([^)]*\)', '고', text) 
+    text = re.sub(r'\(\s*\)', '', text) 
+    
+    # 마침표/쉼표 뒤 띄어쓰기
+    text = re.sub(r'(?<=[가-힣])\.(?=[가-힣a-zA-Z])', '. ', text)
+    text = re.sub(r'(?<=[가-힣])\,(?=[가-힣a-zA-Z])', ', ', text)
+    # 다중 공백 -> 단일 공백
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+def recolor_image_to_white(pil_img):
+    try:
+        r, g, b, a = pil_img.split()
+        white = Image.new('L', pil_img.size, 255)
+        new_img = Image.merge('RGBA', (white, white, white, a))
+        return new_img
+    except: return pil_img
+
+def check_brightness(img, box):
+    try:
+        crop = img.crop(box).convert('L')
+        stat = ImageStat.Stat(crop)
+        return stat.mean[0]
+    except: return 128
+
+# 하단 그라데이션: 행별 알파를 NumPy로 한 번에 계산, 캔버스 크기별로 재사용 (읽기 전용)
+@functools.lru_cache(maxsize=8)
+def create_smooth_gradient(w, h):
+    ratio = np.arange(h) / h
+    alpha = np.zeros(h, dtype=np.uint8)
+    mask = ratio > 0.3
+    alpha[mask] = (255 * ((ratio[mask] - 0.3) / 0.7) ** 1.5).astype(np.uint8)
+    overlay = Image.new('RGBA', (w, h), (0,0,0,0))
+    overlay.putalpha(Image.fromarray(np.repeat(alpha[:, None], w, axis=1), 'L'))
+    return overlay
+
+# 빠른 블러: 1/factor로 줄여서 블러 후 원래 크기로 복원 (반경 20에서 육안 차이 미미)
+def fast_gaussian_blur(img, radius, size=None, factor=4):
+    w, h = size or img.size
+    small = img.resize((max(1, w // factor), max(1, h // factor)), Image.BILINEAR)
+    small = small.filter(ImageFilter.GaussianBlur(radius / factor))
+    return small.resize((w, h), Image.BILINEAR)
+
+def build_background(src, canvas_w, canvas_h, kind, fast_blur=False):
+    if kind == 'COVER':
+        img = ImageEnhance.Brightness(src.resize((canvas_w, canvas_h))).enhance(0.7)
+        grad = create_smooth_gradient(canvas_w, canvas_h)
+        img.paste(grad, (0,0), grad)
+        return img
+    if fast_blur: img = fast_gaussian_blur(src, 20, size=(canvas_w, canvas_h))
+    else: img = src.resize((canvas_w, canvas_h)).filter(ImageFilter.GaussianBlur(20))
+    return ImageEnhance.Brightness(img).enhance(0.3)
+
+# 가공된 배경 LRU 캐시: (풀 이미지 키, 캔버스 크기, 가공 종류, 빠른 블러) -> 배경
+_background_cache = OrderedDict()
+_background_lock = threading.Lock()
+
+def get_background(src, src_key, canvas_w, canvas_h, kind, fast_blur=False, timings=None):
+    if timings is not None: timings['background_cache'] = 'off' if src_key is None else 'miss'
+    if src_key is None: return build_background(src, canvas_w, canvas_h, kind, fast_blur)
+    key = (src_key, canvas_w, canvas_h, kind, fast_blur)
+    with _background_lock:
+        cached = _background_cache.get(key)
+        if cached is not None:
+            _background_cache.move_to_end(key)
+            if timings is not None: timings['background_cache'] = 'hit'
+            return cached.copy()
+    img = build_background(src, canvas_w, canvas_h, kind, fast_blur)
+    with _background_lock:
+        _background_cache[key] = img
+        while len(_background_cache) > BACKGROUND_CACHE_MAX_ENTRIES: _background_cache.popitem(last=False)
+    return img.copy()
+
+def draw_text_with_stroke(draw, pos, text, font, fill="white", stroke_fill="black", stroke_width=2):
+    draw.text(pos, text, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke_fill)
+
+def draw_pill_badge(draw, x, y, text, font, bg_color="#C80000"):
+    padding_x, padding_y = 15, 6
+    bbox = draw.textbbox((0, 0), text, font=font)
+    text_w = bbox[2] - bbox[0]
+    text_h = bbox[3] - bbox[1]
+    
+    h = text_h + padding_y * 2
+    w = text_w + padding_x * 2
+    
+    draw.ellipse((x, y, x+h, y+h), fill=bg_color) 
+    draw.ellipse((x+w-h, y, x+w, y+h), fill=bg_color)
+    draw.rectangle((x+h//2, y, x+w-h//2, y+h), fill=bg_color)
+    
+    draw.text((x + padding_x, y + padding_y - 2), text, font=font, fill="white")
+
+# 레이아웃 측정 캐시: (폰트, 단어)별 폭과 (앞 글자, 뒤 글자)별 띄어쓰기 폭을 한 번만 측정
+# 줄 폭 = 단어 폭 합 + 간격 합 (간격에 공백 폭과 양쪽 커닝이 포함되어 getlength와 같은 값)
+@functools.lru_cache(maxsize=LAYOUT_CACHE_MAX_ENTRIES)
+def text_advance(font, text):
+    return font.getlength(text)
+
+@functools.lru_cache(maxsize=LAYOUT_CACHE_MAX_ENTRIES)
+def word_gap(font, left, right):
+    return text_advance(font, left + " " + right) - text_advance(font, left) - text_advance(font, right)
+
+def measure_words(words, font, char_width):
+    try:
+        widths = [text_advance(font, w) for w in words]
+        gaps = [word_gap(font, a[-1:], b[:1]) for a, b in zip(words, words[1:])]
+    except:
+        widths = [len(w) * char_width for w in words]
+        gaps = [char_width] * (len(words) - 1)
+    return widths, gaps
+
+def wrap_text(text, font, max_width, draw=None):
+    lines = []
+    text = clean_text_spacing(text)
+    if not text: return []
+    for para in text.split('\n'):
+        if not para.strip(): continue
+        words = para.split(' ')
+        widths, gaps = measure_words(words, font, 30)
+        start, line_width = 0, widths[0]
+        for i in range(1, len(words)):
+            candidate = line_width + gaps[i-1] + widths[i]
+            if candidate <= max_width:
+                line_width = candidate
+            else:
+                lines.append(" ".join(words[start:i]))
+                start, line_width = i, widths[i]
+        lines.append(" ".join(words[start:]))
+    return lines
+
+def wrap_title_semantic(text, font, max_width):
+    text = clean_text_spacing(text)
+    words = text.split()
+    if not words: return [text]
+    widths, gaps = measure_words(words, font, 50)
+    # prefix[i] = " ".join(words[:i])의 폭
+    prefix = [0, widths[0]]
+    for i in range(1, len(words)): prefix.append(prefix[i] + gaps[i-1] + widths[i])
+    length = prefix[-1]
+    if length <= max_width: return [text]
+    if len(words) == 1: return [text]
+    
+    sticky = ['안', '못', '더', '잘', '맨', '매일', '가장', '꼭', '좀', '막']
+    split_suffixes = ['은', '는', '이', '가', '을', '를', '에', '의', '와', '과', '로', '도', '만', '서', '고', '며', '니', '면']
+    punctuations = [',', '?', '!', ':', ';']
+    
+    best_split = -1
+    best_score = -float('inf')
+    # L1 글자 수 = 앞 단어 글자 수 합 + 공백
+    chars = 0
+    
+    for i in range(1, len(words)):
+        chars += len(words[i-1]) + (1 if i > 1 else 0)
+        w1 = prefix[i]
+        w2 = length - prefix[i] - gaps[i-1]
+        
+        if w1 > max_width or w2 > max_width: continue
+        
+        score = 0
+        prev_word = words[i-1]
+        
+        if any(prev_word.endswith(p) for p in punctuations): score += 100
+        if prev_word not in sticky:
+            if any(prev_word.endswith(s) for s in split_suffixes): score += 40
+        if prev_word in sticky: score -= 200
+            
+        balance = min(w1, w2) / max(w1, w2)
+        score += balance * 60
+        
+        if chars <= 3: score -= 50
+        
+        if score > best_score:
+            best_score = score
+            best_split = i
+            
+    if best_split != -1:
+        return [" ".join(words[:best_split]), " ".join(words[best_split:])]
+    
+    return wrap_text(text, font, max_width)
+
+# (경로, 크기)별 FreeType 폰트 객체를 프로세스 전체에서 공유 (LRU, 개수 상한)
+@functools.lru_cache(maxsize=FONT_CACHE_MAX_ENTRIES)
+def load_font(path, size):
+    return ImageFont.truetype(path, size)
+
+# 제목 폰트 크기: max_size에서 한 번 재고 폭이 크기에 비례한다고 보고 후보를 예측,
+# 실제 측정으로 경계(후보는 맞고 한 단계 큰 크기는 넘침)를 확인. 5pt 단위 하향 탐색과 같은 결과
+def _title_fits(text, font_path, size, limit):
+    try: length = text_advance(load_font(font_path, size), text)
+    except: length = len(text) * size
+    return length / 2 < limit, length
+
+@functools.lru_cache(maxsize=LAYOUT_CACHE_MAX_ENTRIES)
+def fitted_font_size(text, font_path, max_width, max_size=95, min_size=55):
+    limit = max_width * 1.1
+    sizes = list(range(max_size, min_size - 1, -5))
+    fits, ref_length = _title_fits(text, font_path, max_size, limit)
+    if fits: return max_size
+    i = next((k for k, size in enumerate(sizes) if ref_length * size / max_size / 2 < limit), len(sizes) - 1)
+    if _title_fits(text, font_path, sizes[i], limit)[0]:
+        while i > 1 and _title_fits(text, font_path, sizes[i-1], limit)[0]: i -= 1
+        return sizes[i]
+    while i + 1 < len(sizes):
+        i += 1
+        if _title_fits(text, font_path, sizes[i], limit)[0]: return sizes[i]
+    return min_size
+
+def get_fitted_font(text, font_path, max_width, max_size=95, min_size=55):
+    return load_font(font_path, fitted_font_size(text, font_path, max_width, max_size, min_size))
+
+def generate_qr_code(link):
+    qr = qrcode.QRCode(box_size=10, border=1)
+    qr.add_data(link)
+    qr.make(fit=True)
+    return qr.make_image(fill_color="black", back_color="white").convert("RGBA")
+
+# ==============================================================================
+# 정적 레이어 캐시: 로고(기본/흰색), QR, OUTRO 템플릿은 한 번 만들어 두고 합성만 수행 (읽기 전용)
+# ==============================================================================
+@functools.lru_cache(maxsize=8)
+def load_local_image(path, width_target):
+    if not path or not os.path.exists(path): return None
+    try:
+        img = Image.open(path).convert("RGBA")
+        ar = img.height / img.width
+        return img.resize((width_target, int(width_target * ar)))
+    except: return None
+
+# (기본 레이어, 흰색 레이어, 레이어 y 오프셋, 로고 끝 x 오프셋, 로고 높이): 심볼과 워드마크를 한 장으로 합성
+@functools.lru_cache(maxsize=8)
+def get_logo_layers(symbol_path, text_path):
+    symbol, logotxt = load_local_image(symbol_path, 60), load_local_image(text_path, 160)
+    if not symbol and not logotxt: return None
+    parts, end_x, logo_height = [], 0, 0
+    if symbol:
+        parts.append((symbol, 0, 0))
+        end_x += symbol.width + 15
+        logo_height = max(logo_height, symbol.height)
+    if logotxt:
+        target_y = (symbol.height - logotxt.height) // 2 if symbol else 0
+        parts.append((logotxt, end_x, target_y))
+        end_x += logotxt.width
+        logo_height = max(logo_height, logotxt.height)
+    top = min(py for _, _, py in parts)
+    layer = Image.new('RGBA', (max(px + im.width for im, px, _ in parts), max(py + im.height for im, _, py in parts) - top), (0,0,0,0))
+    for im, px, py in parts: layer.paste(im, (px, py - top))
+    return layer, recolor_image_to_white(layer), top, end_x, logo_height
+
+def paste_logo_smart(bg_img, logo_layers, x=50, y=50):
+    check_area = (x, y, x+300, y+100)
+    brightness = check_brightness(bg_img, check_area)
+    layer, white_layer, top, end_x, logo_height = logo_layers
+    layer = white_layer if brightness < 100 else layer
+    bg_img.paste(layer, (x, y + top), layer)
+    return x + end_x, logo_height
+
+@functools.lru_cache(maxsize=32)
+def get_qr_layer(link, size=250):
+    return generate_qr_code(link).resize((size, size))
+
+# OUTRO 템플릿: 단색 배경 + 슬로건/브랜드/안내 문구 (QR만 기사별로 합성)
+@functools.lru_cache(maxsize=16)
+def get_outro_template(canvas_w, canvas_h, color_main, title_path, body_path, serif_path):
+    fonts = get_font_set(title_path, body_path, serif_path)
+    img = Image.new('RGB', (canvas_w, canvas_h), color_main)
+    draw = ImageDraw.Draw(img, 'RGBA')
+    out_c = "white" if is_color_dark(color_main) else "black"
+    slogan = "First in, Last out"
+    w = draw.textlength(slogan, font=fonts['serif'])
+    draw.text(((canvas_w-w)/2, canvas_h//3), slogan, font=fonts['serif'], fill=out_c)
+    brand = "세상을 보는 눈, 세계일보"
+    w2 = draw.textlength(brand, font=fonts['body'])
+    draw.text(((canvas_w-w2)/2, canvas_h//3 + 130), brand, font=fonts['body'], fill=out_c)
+    msg = "기사 원문 보러가기"
+    w3 = draw.textlength(msg, font=fonts['small'])
+    draw.text(((canvas_w-w3)/2, canvas_h//3 + 300 + 270), msg, font=fonts['small'], fill=out_c)
+    return img
+
+def draw_rounded_box(draw, xy, radius, fill):
+    draw.rounded_rectangle(xy, radius=radius, fill=fill)
+
+def safe_font(path, size):
+    try: return load_font(path, size)
+    except: return ImageFont.load_default()
+
+@functools.lru_cache(maxsize=8)
+def get_font_set(title_path, body_path, serif_path):
+    return {
+        'body': safe_font(body_path, 48),
+        'small': safe_font(body_path, 30),
+        'serif': safe_font(serif_path, 90),
+        'huge': safe_font(title_path, 200),
+        'badge': safe_font(title_path, 35),
+        'quote': safe_font(serif_path, 250),
+    }
+
+# ==============================================================================
+# [2] 슬라이드 렌더링 (순수 함수: 프로세스 풀에서 실행 가능)
+# ==============================================================================
+# spec: 슬라이드 내용 + 메타, assets: 폰트 경로/로고/배경 원본(background_ready면 가공 완료본), canvas: (w, h, is_story)
+# timings: 넘기면 배경 처리 시간/캐시 적중 여부를 기록
+def render_slide(spec, assets, canvas, timings=None):
+    canvas_w, canvas_h, is_story = canvas
+    slide = spec['slide']
+    index, total = spec['index'], spec['total']
+    color_main, tag, link = spec['color'], spec['tag'], spec['link']
+    font_paths = assets['font_paths']
+    logo_layers = get_logo_layers(*assets['logo_paths']) if assets.get('logo_paths') else None
+    fonts = get_font_set(font_paths['title'], font_paths['body'], font_paths['serif'])
+    f_body, f_small = fonts['body'], fonts['small']
+    f_huge, f_badge, f_quote = fonts['huge'], fonts['badge'], fonts['quote']
+
+    sType = slide.get('TYPE', 'BOX').upper()
+    if timings is not None: timings['type'] = sType
+    
+    # 배경
+    if sType == 'OUTRO': img = get_outro_template(canvas_w, canvas_h, color_main, font_paths['title'], font_paths['body'], font_paths['serif']).copy()
+    elif assets.get('background_ready'):
+        # 파이프라인이 미리 가공한 배경
+        img = assets['background'].copy()
+        if timings is not None: timings['background_cache'] = 'prepared'
+    else:
+        kind = 'COVER' if sType == 'COVER' else 'BLUR'
+        t0 = time.perf_counter()
+        img = get_background(assets['background'], assets.get('background_key'), canvas_w, canvas_h, kind, spec.get('fast_blur', False), timings)
+        if timings is not None: timings['background_ms'] = round((time.perf_counter() - t0) * 1000, 1)
+
+    draw = ImageDraw.Draw(img, 'RGBA')
+
+    # 상단 로고 & 뱃지
+    top_y = 100 if is_story else 60
+    if sType != 'OUTRO':
+        next_x = 60
+        logo_height = 40 
+
+        if logo_layers:
+            next_x, logo_height = paste_logo_smart(img, logo_layers, x=60, y=top_y)
+            next_x += 25
+        else:
+            draw.text((60, top_y), "SEGYE BRIEFING", font=f_small, fill=color_main)
+            next_x = 320
+
+        if tag:
+            badge_y = top_y - 2
+            draw_pill_badge(draw, next_x, badge_y, tag, f_badge, bg_color="#C80000")
+
+        draw_text_with_stroke(draw, (canvas_w-130, top_y), f"{index+1}/{total}", f_small)
+
+    # 내용 그리기
+    head = clean_text_spacing(slide.get('HEAD', ''))
+    desc = clean_text_spacing(slide.get('DESC', ''))
+    content_width = canvas_w - 200 
+    f_title = get_fitted_font(head, font_paths['title'], content_width)
+
+    if sType == 'COVER':
+        d_lines = wrap_text(desc, f_body, content_width)
+        curr_y = canvas_h - 150 - (len(d_lines)*60)
+        for l in d_lines:
+            draw_text_with_stroke(draw, (60, curr_y), l, f_body, stroke_width=2)
+            curr_y += 60
+        curr_y -= (len(d_lines)*60 + 40)
+        draw.rectangle([(60, curr_y), (160, curr_y+10)], fill=color_main)
+
+        h_lines = wrap_title_semantic(head, f_title, content_width)
+
+        indent_x = 0
+        if h_lines and h_lines[0].startswith(("'", '"', "“", "‘")):
+            try: indent_x = f_title.getlength(h_lines[0][0])
+            except: indent_x = 20
+
+        curr_y -= (len(h_lines)*110 + 20)
+        for idx, l in enumerate(h_lines):
+            draw_x = 60
+            if idx > 0: draw_x += indent_x 
+            draw_text_with_stroke(draw, (draw_x, curr_y), l, f_title, stroke_width=3)
+            curr_y += 110
+
+    elif sType == 'DATA':
+        bbox = draw.textbbox((0,0), head, font=f_huge)
+        w, h = bbox[2]-bbox[0], bbox[3]-bbox[1]
+        draw_text_with_stroke(draw, ((canvas_w-w)//2, (canvas_h-h)//2 - 100), head, f_huge, fill=color_main, stroke_width=4)
+        d_lines = wrap_text(desc, f_body, 800)
+        curr_y = (canvas_h//2) + 100
+        for l in d_lines:
+            lw = draw.textlength(l, font=f_body)
+            draw_text_with_stroke(draw, ((canvas_w-lw)//2, curr_y), l, f_body, stroke_width=2)
+            curr_y += 60
+
+    elif sType == 'QUOTE':
+        head = head.replace('"', '').replace("'", "")
+        start_y = 250 if not is_story else 350
+        draw.text((80, start_y - 120), "“", font=f_quote, fill=(255,255,255,70))
+
+        h_lines = wrap_title_semantic(head, f_title, content_width)
+        for l in h_lines:
+            draw_text_with_stroke(draw, (150, start_y), l, f_title, stroke_width=3)
+            start_y += 110
+        draw.line((150, start_y+20, 350, start_y+20), fill=color_main, width=5)
+        start_y += 60
+        d_lines = wrap_text(desc, f_body, content_width)
+        for l in d_lines:
+            draw_text_with_stroke(draw, (150, start_y), l, f_body, stroke_width=2)
+            start_y += 65
+
+    elif sType == 'BAR':
+        start_y = 250 if not is_story else 350
+        h_lines = wrap_title_semantic(head, f_title, content_width)
+        d_lines = wrap_text(desc, f_body, content_width)
+        draw.rectangle([(80, start_y), (95, start_y + (len(h_lines)*110) + (len(d_lines)*65) + 60)], fill=color_main)
+
+        indent_x = 0
+        if h_lines and h_lines[0].startswith(("'", '"', "“", "‘")):
+            try: indent_x = f_title.getlength(h_lines[0][0])
+            except: indent_x = 20
+
+        for idx, l in enumerate(h_lines):
+            draw_x = 120
+            if idx > 0: draw_x += indent_x
+            draw_text_with_stroke(draw, (draw_x, start_y), l, f_title, stroke_width=3)
+            start_y += 110
+        start_y += 30
+        for l in d_lines:
+            draw_text_with_stroke(draw, (120, start_y), l, f_body, stroke_width=2)
+            start_y += 65
+
+    elif sType == 'OUTRO':
+        qr = get_qr_layer(link)
+        img.paste(qr, ((canvas_w-250)//2, canvas_h//3 + 300), qr)
+
+    else: # BOX
+        start_y = 250 if not is_story else 350
+        h_lines = wrap_title_semantic(head, f_title, content_width)
+        d_lines = wrap_text(desc, f_body, content_width)
+        box_h = (len(h_lines)*110) + (len(d_lines)*65) + 120
+        box_start_y = max(start_y, (canvas_h - box_h) // 2)
+        draw_rounded_box(draw, (80, box_start_y, canvas_w-80, box_start_y + box_h), 30, (0,0,0,160))
+        txt_y = box_start_y + 50
+
+        indent_x = 0
+        if h_lines and h_lines[0].startswith(("'", '"', "“", "‘")):
+            try: indent_x = f_title.getlength(h_lines[0][0])
+            except: indent_x = 20
+
+        for idx, l in enumerate(h_lines):
+            draw_x = 120
+            if idx > 0: draw_x += indent_x
+            draw_text_with_stroke(draw, (draw_x, txt_y), l, f_title, fill=color_main, stroke_width=0)
+            txt_y += 110
+        draw.line((120, txt_y+10, 320, txt_y+10), fill=color_main, width=5)
+        txt_y += 40
+        for l in d_lines:
+            draw_text_with_stroke(draw, (120, txt_y), l, f_body, fill="white", stroke_width=0)
+            txt_y += 65
+
+    return img
+
+# 프로세스 풀용: (이미지, 타이밍) 반환
+def render_slide_timed(spec, assets, canvas):
+    timings = {}
+    t0 = time.perf_counter()
+    img = render_slide(spec, assets, canvas, timings)
+    timings['ms'] = round((time.perf_counter() - t0) * 1000, 1)
+    return img, timings
+
+# 렌더 워커 initializer: 풀 생성 전에 만든 barrier를 받아 둠 (동기화 객체는 fork로만 넘길 수 있음)
+_warm_barrier = None
+
+def init_render_worker(barrier):
+    global _warm_barrier
+    _warm_barrier = barrier
+
+# 폰트/로고를 미리 로드해 첫 슬라이드가 디스크 I/O를 기다리지 않게 함, 반환: 프로세스 pid
+# 워커에서는 모든 워커가 한 작업씩 잡을 때까지 대기 (먼저 끝난 워커가 다른 워커 몫을 가져가지 않도록)
+def warm_render_assets(font_paths, logo_paths, timeout=30):
+    get_font_set(font_paths['title'], font_paths['body'], font_paths['serif'])
+    if font_paths['title']:
+        for size in range(95, 54, -5): load_font(font_paths['title'], size)
+    get_logo_layers(*logo_paths)
+    if _warm_barrier is not None:
+        try: _warm_barrier.wait(timeout)
+        except threading.BrokenBarrierError: pass
+    return os.getpid()